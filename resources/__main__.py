@@ -6,28 +6,25 @@ Where actions can be any list of actions to take.
 
 """
 
-import difflib
-import json
 import os
 import shutil
 import sys
 import zipfile
 from argparse import ArgumentParser
-from typing import Optional
+from typing import Optional, Sequence
 
 from mcresources import ResourceManager, utils
 
-import advancements
-import assets
+import benchmark
 import constants
-import data
+import datagen
+import dedupe_textures
 import format_lang
 import generate_book
 import generate_textures
 import generate_trees
-import recipes
+import profiler
 import validate_assets
-import world_gen
 
 BOOK_LANGUAGES = ('en_us', 'ja_jp', 'ko_kr', 'pt_br', 'uk_ua', 'zh_cn', 'zh_tw', 'zh_hk')
 MOD_LANGUAGES = ('en_us', 'es_es', 'de_de', 'ja_jp', 'ko_kr', 'pl_pl', 'pt_br', 'ru_ru', 'tr_tr', 'uk_ua', 'zh_cn', 'zh_tw', 'zh_hk')
@@ -48,8 +45,9 @@ def main():
         'trees',  # generate tree NBT structures from templates
         'format_lang',  # format language files
         'update_lang',  # useful to update localizations after a change to the base which renders some translations incorrect
-        'textures',  # generate textures
+        'textures',  # generate textures, and find duplicate textures
         'zip',  # zips resources for faster loading in dev
+        'benchmark',  # benchmark resource generation, and compare against a stored baseline
     ))
     parser.add_argument('--translate', type=str, default='en_us', help='Runs the book translation using a single provided language')
     parser.add_argument('--translate-all', action='store_true', dest='translate_all', help='Runs the book against all provided translations')
@@ -57,6 +55,14 @@ def main():
     parser.add_argument('--local', type=str, default=None, help='Points to a local minecraft instance. Used for \'book\', to generate a hot reloadable book, and used for \'clean\', to clean said instance\'s book')
     parser.add_argument('--hotswap', action='store_true', dest='hotswap', help='Causes resource generation to also generate to --hotswap-dir')
     parser.add_argument('--hotswap-dir', type=str, default='./out/production/resources', help='Used for \'--hotswap\'')
+    parser.add_argument('--jobs', type=int, default=1, help='The number of worker processes used to run resource generation. Each generator (assets, data, etc.), and each book language, runs in its own process. Textures are generated in parallel per wood, rock and soil, tree structures per tree, and asset files are parsed in parallel for \'validate_assets\'')
+    parser.add_argument('--artifact', type=str, default=None, help='Used for \'validate\', to validate against a directory or zip file (such as a built jar) instead of the resource directory')
+    parser.add_argument('--profile', type=str, nargs='?', default=None, const=profiler.REPORT_PATH, help='Profiles resource generation, printing a table of the time taken by each generator, and each section within it, and writing a JSON report to the given path (default %s), keyed by action. For \'textures\', prints the time taken by each composited texture layer' % profiler.REPORT_PATH)
+    parser.add_argument('--repeat', type=int, default=benchmark.DEFAULT_REPEAT, help='Used for \'benchmark\', the number of times to run each benchmark')
+    parser.add_argument('--threshold', type=float, default=benchmark.DEFAULT_THRESHOLD, help='Used for \'benchmark\', the fraction a benchmark must be slower than the baseline by to be reported as a regression')
+    parser.add_argument('--update-baseline', action='store_true', dest='update_baseline', help='Used for \'benchmark\', to store this run as the baseline')
+    parser.add_argument('--optimize-png', action='store_true', dest='optimize_png', help='Used for \'textures\', to losslessly optimize all generated textures')
+    parser.add_argument('--incremental', action='store_true', dest='incremental', help='Skips resource generation, texture, book and lang formatting steps whose inputs are unchanged since the last run')
 
     args = parser.parse_args()
     hotswap = args.hotswap_dir if args.hotswap else None
@@ -65,42 +71,39 @@ def main():
         if action == 'clean':
             clean(args.local)
         elif action == 'validate':
-            validate_resources()
+            validate_resources(args.artifact)
         elif action == 'validate_assets':
-            validate_assets.main()
+            validate_assets.main(args.jobs)
         elif action == 'all':
-            resources(hotswap=hotswap, do_assets=True, do_data=True, do_recipes=True, do_worldgen=True, do_advancements=True)
-            format_lang.main(False, 'minecraft', MOD_LANGUAGES)  # format_lang
-            format_lang.main(False, 'tfc', MOD_LANGUAGES)
-            for lang in BOOK_LANGUAGES:  # Translate all
-                generate_book.main(lang, args.local, False)
+            resources(hotswap=hotswap, jobs=args.jobs, incremental=args.incremental, profile=args.profile, do_assets=True, do_data=True, do_recipes=True, do_worldgen=True, do_advancements=True)
+            format_langs(args.incremental)
+            books(BOOK_LANGUAGES, args.local, incremental=args.incremental, jobs=args.jobs)  # Translate all
         elif action == 'assets':
-            resources(hotswap=hotswap, do_assets=True)
+            resources(hotswap=hotswap, jobs=args.jobs, incremental=args.incremental, profile=args.profile, do_assets=True)
         elif action == 'data':
-            resources(hotswap=hotswap, do_data=True)
+            resources(hotswap=hotswap, jobs=args.jobs, incremental=args.incremental, profile=args.profile, do_data=True)
         elif action == 'recipes':
-            resources(hotswap=hotswap, do_recipes=True)
+            resources(hotswap=hotswap, jobs=args.jobs, incremental=args.incremental, profile=args.profile, do_recipes=True)
         elif action == 'worldgen':
-            resources(hotswap=hotswap, do_worldgen=True)
+            resources(hotswap=hotswap, jobs=args.jobs, incremental=args.incremental, profile=args.profile, do_worldgen=True)
         elif action == 'advancements':
-            resources(hotswap=hotswap, do_advancements=True)
+            resources(hotswap=hotswap, jobs=args.jobs, incremental=args.incremental, profile=args.profile, do_advancements=True)
         elif action == 'textures':
-            generate_textures.main()
+            generate_textures.main(args.jobs, args.incremental, args.optimize_png, args.profile is not None)
+            dedupe_textures.main()
         elif action == 'book':
-            if args.translate_all:
-                for lang in BOOK_LANGUAGES:
-                    generate_book.main(lang, args.local, validate=False, reverse_translate=args.reverse_translate)
-            else:
-                generate_book.main(args.translate, args.local, validate=False, reverse_translate=args.reverse_translate)
+            books(BOOK_LANGUAGES if args.translate_all else (args.translate,), args.local, args.reverse_translate, args.incremental, args.jobs)
         elif action == 'trees':
-            generate_trees.main()
+            generate_trees.main(args.jobs)
         elif action == 'format_lang':
-            format_lang.main(False, 'minecraft', MOD_LANGUAGES)
-            format_lang.main(False, 'tfc', MOD_LANGUAGES)
+            format_langs(args.incremental)
         elif action == 'update_lang':
             format_lang.update(MOD_LANGUAGES)
         elif action == 'zip':
             zip_resources()
+        elif action == 'benchmark':
+            regressed = benchmark.main(args.repeat, args.threshold, args.update_baseline)
+            assert not regressed, 'Benchmark Regressions Were Present'
 
 def clean(local: Optional[str]):
     """ Cleans all generated resources files """
@@ -119,9 +122,12 @@ def clean_at(location: str):
     print('Clean Aborted')
 
 
-def validate_resources():
-    """ Validates all resources are unchanged. """
-    rm = ValidatingResourceManager('tfc', './src/main/resources')
+def validate_resources(artifact: Optional[str]):
+    """ Validates all resources are unchanged. If an artifact (a directory, or zip file such as a built jar) is provided, resources are validated against that instead """
+    if artifact:
+        rm = datagen.InMemoryResourceManager('tfc', './src/main/resources')
+    else:
+        rm = datagen.ValidatingResourceManager('tfc', './src/main/resources')
     resources_at(rm, True, True, True, True, True)
     error = rm.error_files != 0
 
@@ -133,6 +139,17 @@ def validate_resources():
             print(e)
             error = True
 
+    if artifact:
+        diff = rm.diff(artifact)
+        for path in diff.added:
+            print('Error: resource generation created file \'%s\' not present in %s' % (path, artifact), file=sys.stderr)
+        for path in diff.modified:
+            print('Error: resource generation modified file \'%s\' in %s' % (path, artifact), file=sys.stderr)
+        print('Validated %d files against %s: %d new, %d modified' % (len(rm.files), artifact, len(diff.added), len(diff.modified)))
+        error |= bool(diff.added or diff.modified)
+    else:
+        rm.save_indexes()
+
     for lang in MOD_LANGUAGES:
         try:
             format_lang.main(True, 'minecraft', (lang,))
@@ -177,66 +194,86 @@ def rescue_folder(path: str):
     shutil.copytree('./src/main/resources/%s' % path, './out/production/resources/%s' % path, dirs_exist_ok=True)
 
 
-def resources(hotswap: str = None, do_assets: bool = False, do_data: bool = False, do_recipes: bool = False, do_worldgen: bool = False, do_advancements: bool = False):
-    """ Generates resource files, or a subset of them """
-    resources_at(ResourceManager('tfc', resource_dir='./src/main/resources'), do_assets, do_data, do_recipes, do_worldgen, do_advancements)
-    if hotswap:
-        resources_at(ResourceManager('tfc', resource_dir=hotswap), do_assets, do_data, do_recipes, do_worldgen, do_advancements)
-
-
-def resources_at(rm: ResourceManager, do_assets: bool, do_data: bool, do_recipes: bool, do_worldgen: bool, do_advancements: bool):
+def books(langs: Sequence[str], local: Optional[str], reverse_translate: bool = False, incremental: bool = False, jobs: int = 1):
+    """
+    Generates the book for each language. Languages are independent, so with jobs > 1 they are generated in parallel, and the output of each is printed in order.
+    Incremental generation is not used for local instances, or when reverse translating, as those write outside of the resource directory
+    """
+    manifest = datagen.Manifest(['./src/main/resources']) if incremental and local is None and not reverse_translate else None
+    pending = []
+    for lang in langs:
+        if manifest is not None and manifest.is_up_to_date('book/%s' % lang, datagen.book_inputs(lang)):
+            print('Skipping book at %s, as it is up to date' % lang)
+        else:
+            pending.append(lang)
+
+    index = datagen.OutputIndex('./src/main/resources')
+    for lang, result in zip(pending, datagen.generate_books(pending, local, reverse_translate, ['./src/main/resources'], jobs)):
+        print(result.log, end='')
+        index.update(result.index_updates[0])
+        if manifest is not None:
+            manifest.update('book/%s' % lang, datagen.book_inputs(lang), result.files)
+    index.save()
+    if manifest is not None:
+        manifest.save()
+
+
+def format_langs(incremental: bool = False):
+    manifest = datagen.Manifest(['./src/main/resources']) if incremental else None
+    inputs = datagen.lang_inputs(MOD_LANGUAGES)
+    if manifest is not None and manifest.is_up_to_date('lang', inputs):
+        print('Skipping format_lang, as it is up to date')
+        return
+    format_lang.main(False, 'minecraft', MOD_LANGUAGES)
+    format_lang.main(False, 'tfc', MOD_LANGUAGES)
+    if manifest is not None:
+        manifest.update('lang', inputs, [])  # Formatting rewrites the lang files, so they are digested after formatting, for the next run to skip
+        manifest.save()
+
+
+def resources(hotswap: str = None, jobs: int = 1, incremental: bool = False, profile: str = None, do_assets: bool = False, do_data: bool = False, do_recipes: bool = False, do_worldgen: bool = False, do_advancements: bool = False):
+    """ Generates resource files, or a subset of them. With hotswap, each resource is generated once, and written to both locations """
+    resource_dirs = ['./src/main/resources', hotswap] if hotswap else ['./src/main/resources']
+    rm = datagen.FanOutResourceManager('tfc', resource_dirs)
+    resources_at(rm, do_assets, do_data, do_recipes, do_worldgen, do_advancements, jobs, incremental, profile)
+    rm.save_indexes()
+
+
+def resources_at(rm: ResourceManager, do_assets: bool, do_data: bool, do_recipes: bool, do_worldgen: bool, do_advancements: bool, jobs: int = 1, incremental: bool = False, profile_path: str = None):
     # do simple lang keys first, because it's ordered intentionally
     rm.lang(constants.DEFAULT_LANG)
 
+    profile = profiler.Profiler() if profile_path else None
+    if profile is not None:
+        profile.wrap(rm)
+
     # generic assets / data
-    if do_assets:
-        assets.generate(rm)
-    if do_data:
-        data.generate(rm)
-    if do_recipes:
-        recipes.generate(rm)
-    if do_worldgen:
-        world_gen.generate(rm)
-    if do_advancements:
-        advancements.generate(rm)
+    generators = [name for name, enabled in zip(datagen.GENERATORS, (do_assets, do_data, do_recipes, do_worldgen, do_advancements)) if enabled]
+    if jobs > 1 or incremental:
+        # Generators are run independently, writing their own files, and only lang + tag entries are merged back into rm
+        # This can only be used with a plain ResourceManager, as generators cannot share the state of i.e. a ValidatingResourceManager
+        manifest = datagen.Manifest(datagen.resource_dirs(rm)) if incremental else None
+        timings = datagen.generate_all(rm, generators, jobs, manifest, profile is not None)
+        if profile is not None:
+            profile.timings += timings
+    else:
+        for name in generators:
+            datagen.run(name, rm, profile)
 
     if all((do_assets, do_data, do_worldgen, do_recipes, do_advancements)):
         # Only generate this when generating all, as it's shared
-        rm.flush()
+        if profile is not None:
+            profile.profile('flush', ResourceManager.flush, rm)
+        else:
+            rm.flush()
 
         # Separate generation for vanilla override lang
-        vanilla_rm = ResourceManager('minecraft', resource_dir=rm.resource_dir)
-        vanilla_rm.lang(constants.VANILLA_OVERRIDE_LANG)
-        vanilla_rm.flush()
+        # This is written directly, as it is not in the tfc domain, but still needs to be written the same way as all other resources
+        rm.write((*rm.resource_dir, 'assets', 'minecraft', 'lang', rm.default_language), constants.VANILLA_OVERRIDE_LANG)
 
     print('New = %d, Modified = %d, Unchanged = %d, Errors = %d' % (rm.new_files, rm.modified_files, rm.unchanged_files, rm.error_files))
-
-
-class ValidatingResourceManager(ResourceManager):
-
-    def __init__(self, domain: str, resource_dir):
-        super(ValidatingResourceManager, self).__init__(domain, resource_dir)
-        self.validation_error = False
-
-    def write(self, path_parts, data_to_write):
-        data_to_write = utils.del_none({'__comment__': 'This file was automatically created by mcresources', **data_to_write})
-        path = os.path.join(*path_parts) + '.json'
-        try:
-            if not os.path.isfile(path):
-                print('Error: resource generation created new file \'%s\'' % path, file=sys.stderr)
-                self.error_files += 1
-                return
-            with open(path, 'r', encoding='utf-8') as file:
-                old_data = json.load(file)
-            if old_data != data_to_write:
-                old_text = json.dumps(old_data, indent=self.indent)
-                text = json.dumps(data_to_write, indent=self.indent)
-                diff = '\n'.join(difflib.unified_diff(old_text.split('\n'), text.split('\n'), 'old', 'new', n=1))
-                print('Error: resource generation modified file \'%s\' Diff:\n%s\n' % (path, diff), file=sys.stderr)
-                self.error_files += 1
-        except Exception as e:
-            self.on_error(path, e)
-            self.error_files += 1
+    if profile is not None:
+        profiler.report('all' if len(generators) == len(datagen.GENERATORS) else '+'.join(generators), profile.timings, profile_path)
 
 
 if __name__ == '__main__':
@@ -6,11 +6,14 @@ import itertools
 from mcresources import ResourceManager, ItemContext, utils, block_states, loot_tables
 
 from constants import *
+import dedupe_textures
+import profiler
 
 
+@dedupe_textures.deduplicating
 def generate(rm: ResourceManager):
-
     # Rock Type Blocks
+    profiler.section('rocks')
     for rock, rock_data in ROCKS.items():
 
         # Aqueducts
@@ -177,6 +180,7 @@ def generate(rm: ResourceManager):
                 rm.block_loot('tfc:ore/%s/%s' % (ore, rock), 'tfc:ore/%s' % ore)
 
     # Loose Ore Items
+    profiler.section('ores')
     for ore, ore_data in ORES.items():
         if ore_data.graded:
             for grade in ORE_GRADES.keys():
@@ -190,6 +194,7 @@ def generate(rm: ResourceManager):
                 item.with_lang(lang(ore))
 
     # Sand
+    profiler.section('sand')
     for sand in SAND_BLOCK_TYPES:
         rm.blockstate(('sand', sand), variants={"": four_ways('tfc:block/sand/%s' % sand)}, use_default_model=False).with_block_model().with_item_model().with_block_loot('tfc:sand/%s' % sand).with_lang(lang('%s sand', sand))
 
@@ -229,6 +234,7 @@ def generate(rm: ResourceManager):
                 block.with_lang(lang('%s %s sandstone' + extra, variant, sand))
 
     # Groundcover
+    profiler.section('groundcover')
     for misc in MISC_GROUNDCOVER:
         block = rm.blockstate(('groundcover', misc), variants={"": four_ways('tfc:block/groundcover/%s' % misc)}, use_default_model=False)
         block.with_lang(lang(misc))
@@ -242,6 +248,7 @@ def generate(rm: ResourceManager):
             block.with_block_loot('tfc:groundcover/%s' % misc)
             rm.item_model(('groundcover', misc), 'tfc:item/groundcover/%s' % misc)
 
+    profiler.section('blocks')
     for block in SIMPLE_BLOCKS:
         rm.blockstate(block).with_block_model().with_item_model().with_block_loot('tfc:%s' % block).with_lang(lang(block))
     rm.blockstate('thatch').with_block_model({'texture': 'tfc:block/thatch'}, parent='block/powder_snow').with_item_model().with_block_loot('tfc:thatch').with_lang(lang('thatch'))
@@ -539,6 +546,7 @@ def generate(rm: ResourceManager):
     rm.block_model('flower_pot', {'dirt': 'tfc:block/dirt/loam'}, parent='minecraft:block/flower_pot')
 
     # Dirt
+    profiler.section('soil')
     for soil in SOIL_BLOCK_VARIANTS:
         # Regular Dirt
         block = rm.blockstate(('dirt', soil), variants={'': [{'model': 'tfc:block/dirt/%s' % soil, 'y': i} for i in range(0, 360, 90)]}, use_default_model=False)
@@ -696,6 +704,7 @@ def generate(rm: ResourceManager):
                 item.with_lang(lang('%s %s', size, hide))
 
     # Rock Tools
+    profiler.section('rock_items')
     for rock in ROCK_CATEGORIES:
         for rock_item in ROCK_CATEGORY_ITEMS:
             for suffix in ('', '_head'):
@@ -792,6 +801,7 @@ def generate(rm: ResourceManager):
                     block.with_item_model()
 
     # Misc Items
+    profiler.section('items')
     for gem in GEMS:
         rm.item_model(('gem', gem)).with_lang(lang('cut %s', gem))
         rm.item_model(('powder', gem)).with_lang(lang('%s powder', gem))
@@ -874,6 +884,7 @@ def generate(rm: ResourceManager):
     contained_fluid(rm, ('ceramic', 'fire_ingot_mold'), 'tfc:item/ceramic/fired_mold/fire_ingot_empty', 'tfc:item/ceramic/fired_mold/fire_ingot_overlay').with_lang(lang('fire ingot mold'))
 
     # Crops
+    profiler.section('crops')
     for crop, crop_data in CROPS.items():
         name = 'tfc:' + crop if crop == 'jute' or crop == 'papyrus' else 'tfc:food/%s' % crop
         if crop_data.type == 'default' or crop_data.type == 'spreading':
@@ -1059,6 +1070,7 @@ def generate(rm: ResourceManager):
     rm.block_model(('crop', 'stick'), {'crop': 'tfc:block/crop/stick_top'}, parent='block/crop')
 
     # Plants
+    profiler.section('plants')
     for plant, plant_data in PLANTS.items():
         rm.lang('block.tfc.plant.%s' % plant, lang(plant))
         p = 'tfc:plant/%s' % plant
@@ -1151,6 +1163,7 @@ def generate(rm: ResourceManager):
         rm.block_model('plant/%s' % plant, parent='tfc:block/plant/template_floating_tinted', textures={'pad': 'tfc:block/plant/%s/%s' % (plant, plant)})
 
     # Food
+    profiler.section('food')
     for berry in BERRIES.keys():
         rm.item_model('food/' + berry).with_lang(lang(berry))
 
@@ -1177,6 +1190,7 @@ def generate(rm: ResourceManager):
         rm.item_model(('food', '%s_salad' % nutrient)).with_lang(lang('%s salad', funny_salad_name)).with_tag('salads')
 
     # Berry Bushes
+    profiler.section('fruit_trees')
     lifecycle_to_model = {'healthy': '', 'dormant': 'dry_', 'fruiting': 'fruiting_', 'flowering': 'flowering_'}
     lifecycles = ('healthy', 'dormant', 'fruiting', 'flowering')
 
@@ -1316,6 +1330,7 @@ def generate(rm: ResourceManager):
         flower_pot_cross(rm, '%s sapling' % fruit, 'tfc:plant/potted/%s_sapling' % fruit, 'plant/flowerpot/%s_sapling' % fruit, 'tfc:block/fruit_tree/%s_sapling' % fruit, 'tfc:plant/%s_sapling' % fruit)
 
     # Wood Blocks
+    profiler.section('wood')
     for wood in WOODS.keys():
         # Logs
         for variant in ('log', 'stripped_log', 'wood', 'stripped_wood'):
@@ -1557,6 +1572,7 @@ def generate(rm: ResourceManager):
     rm.block_loot('minecraft:trapped_chest', {'name': 'tfc:wood/trapped_chest/oak', 'functions': [loot_tables.copy_block_entity_name()]})
 
     # Candles
+    profiler.section('misc')
     for color in [None, *COLORS]:
         namespace = 'tfc:candle' + ('/' + color if color else '')
         candle = '%s_candle' % color if color else 'candle'
@@ -1592,6 +1608,7 @@ def generate(rm: ResourceManager):
         rm.item_model('bucket/%s' % creature).with_lang(lang('%s Bucket', creature))
 
     # Fluids
+    profiler.section('fluids')
 
     water_based_fluid(rm, 'salt_water')
     water_based_fluid(rm, 'spring_water')
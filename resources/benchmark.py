@@ -0,0 +1,177 @@
+"""
+Benchmarks for the resource generation pipeline.
+
+Each benchmark times a single part of the pipeline on fixed inputs, excluding any setup. Resource generators write into an in-memory resource manager, so nothing is written to disk.
+All benchmarks run in a scratch copy of the resource directories, so they never modify the working tree, and every run is measured on the same inputs. Caches are cleared before every run, and benchmarks which use a cache (such as the translation memory) seed it in their setup.
+Every run is appended to a history file, and compared against a stored baseline, by the median time of each benchmark. Benchmarks which are slower than the baseline by more than both a threshold and a minimum absolute time are reported as regressions.
+
+Invoke with 'python resources benchmark'. Use --update-baseline to store the current run as the baseline.
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from typing import NamedTuple, Callable, Any, Dict, List, Optional
+
+import datagen
+import generate_book
+import generate_textures
+import generate_trees
+import i18n
+import validate_assets
+from i18n import I18n
+
+HISTORY_PATH = './.cache/benchmark_history.json'
+BASELINE_PATH = './.cache/benchmark_baseline.json'
+SCRATCH_DIRS = ('./resources', './src/main/resources')  # The inputs of all benchmarks
+CACHE_PATHS = (os.path.dirname(i18n.MEMORY_PATH), generate_textures.MANIFEST_PATH, generate_trees.MANIFEST_PATH)  # Caches which are cleared before every run
+
+BOOK_LANG = 'zh_cn'  # A translated language, as en_us skips translation entirely
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.1  # Fraction of the baseline time
+MIN_DELTA = 0.05  # Seconds. Benchmarks must be slower than the baseline by at least this much to regress, as very short benchmarks are dominated by noise
+
+
+class Benchmark(NamedTuple):
+    name: str
+    setup: Callable[[], Any]  # Creates the state used by a single run. Not timed.
+    run: Callable[[Any], None]
+
+
+class Result(NamedTuple):
+    name: str
+    median: float  # Seconds
+    best: float
+    mean: float
+    runs: int
+
+
+def generator_benchmark(name: str) -> Benchmark:
+    return Benchmark('generate/%s' % name, lambda: datagen.InMemoryResourceManager('tfc', './src/main/resources'), lambda rm: datagen.GENERATORS[name](rm))
+
+
+def translate_texts() -> List[str]:
+    """ A fixed sample of book text, each modified slightly so that they are never exact matches, and always use fuzzy matching """
+    with open('./resources/lang/en_us.json', 'r', encoding='utf-8') as f:
+        keys = sorted(json.load(f).keys())
+    return [key[:-1] for key in keys[::10] if len(key) > 1]
+
+
+def translate_all(state):
+    i18n, texts = state
+    for text in texts:
+        i18n.translate(text)
+
+
+def cold_translate() -> tuple:
+    return I18n(BOOK_LANG), translate_texts()
+
+
+def warm_translate() -> tuple:
+    """ Translates all texts once, and saves the translation memory, so a new I18n starts with all matches in memory """
+    state = cold_translate()
+    translate_all(state)
+    state[0].memory.save()
+    return I18n(BOOK_LANG), state[1]
+
+
+BENCHMARKS: List[Benchmark] = [
+    *[generator_benchmark(name) for name in datagen.GENERATORS],
+    Benchmark('make_book', lambda: None, lambda _: generate_book.make_book()),
+    Benchmark('build_book/%s' % BOOK_LANG, lambda: (generate_book.field_guide(), datagen.InMemoryResourceManager('tfc', './src/main/resources'), I18n(BOOK_LANG)), lambda state: state[0].build(*state[1:])),
+    Benchmark('translate/cold', cold_translate, translate_all),
+    Benchmark('translate/warm', warm_translate, translate_all),
+    Benchmark('translate/batch', cold_translate, lambda state: state[0].match_all(state[1])),
+    Benchmark('validate_assets', lambda: None, lambda _: validate_assets.main()),
+    Benchmark('textures', lambda: None, lambda _: generate_textures.main()),
+    Benchmark('trees', lambda: None, lambda _: generate_trees.main()),
+]
+
+
+def main(repeat: int = DEFAULT_REPEAT, threshold: float = DEFAULT_THRESHOLD, update_baseline: bool = False) -> bool:
+    """
+    Runs all benchmarks, records them in the history, and compares them against the baseline.
+    :param repeat: The number of times to run each benchmark. The median time is used for comparisons.
+    :param threshold: The fraction of the baseline time a benchmark must be slower by, to be a regression. It must also be slower by at least MIN_DELTA.
+    :param update_baseline: If true, or if there is no baseline, this run is stored as the baseline.
+    :return: True if any benchmark regressed.
+    """
+    with scratch_copy():
+        results = [run_benchmark(benchmark, repeat) for benchmark in BENCHMARKS]
+    entry = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'results': {result.name: {'median': result.median, 'best': result.best, 'mean': result.mean, 'runs': result.runs} for result in results}
+    }
+
+    history = datagen.load_json(HISTORY_PATH) or {'runs': []}
+    history['runs'].append(entry)
+    save_json(HISTORY_PATH, history)
+
+    baseline: Optional[Dict[str, Any]] = None if update_baseline else datagen.load_json(BASELINE_PATH) or None
+    if baseline is None:
+        print('Storing baseline at %s' % BASELINE_PATH)
+        save_json(BASELINE_PATH, entry)
+        baseline = entry
+
+    regressions = 0
+    print('%-30s %10s %10s %10s %8s' % ('Benchmark', 'Median (s)', 'Best (s)', 'Base (s)', 'Change'))
+    for result in results:
+        base = baseline['results'].get(result.name)
+        if base is None:
+            print('%-30s %10.3f %10.3f %10s %8s' % (result.name, result.median, result.best, '-', '-'))
+            continue
+        base_median = base.get('median', base['best'])  # Older baselines only recorded the best time
+        change = result.median / base_median - 1 if base_median > 0 else 0
+        regressed = result.median - base_median > max(threshold * base_median, MIN_DELTA)
+        regressions += regressed
+        print('%-30s %10.3f %10.3f %10.3f %+7.1f%%%s' % (result.name, result.median, result.best, base_median, 100 * change, '  Regression!' if regressed else ''))
+    print('Benchmarked %d, Regressions = %d (threshold %.0f%% and %.2fs, baseline from %s)' % (len(results), regressions, 100 * threshold, MIN_DELTA, baseline['time']))
+    return regressions > 0
+
+
+def run_benchmark(benchmark: Benchmark, repeat: int) -> Result:
+    print('Benchmarking %s' % benchmark.name)
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):  # Silence the output of the benchmarked code
+            clear_caches()
+            state = benchmark.setup()
+            start = time.perf_counter()
+            benchmark.run(state)
+            times.append(time.perf_counter() - start)
+    return Result(benchmark.name, statistics.median(times), min(times), sum(times) / len(times), len(times))
+
+
+def clear_caches():
+    for path in CACHE_PATHS:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.isfile(path):
+            os.remove(path)
+
+
+@contextlib.contextmanager
+def scratch_copy():
+    """ Runs benchmarks in a scratch copy of the resource directories, without any caches """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        for path in SCRATCH_DIRS:
+            shutil.copytree(path, os.path.join(scratch, path))
+        os.chdir(scratch)
+        try:
+            yield
+        finally:
+            os.chdir(cwd)
+
+
+def save_json(path: str, data: Any):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data, indent=2))
@@ -0,0 +1,119 @@
+"""
+A small, declarative layer compositing engine, for textures which are built from other textures.
+
+A graph is a map of named layers, where each layer is an operation (i.e. a crop, or a paste) on other layers. Graphs are rendered once per material, with parameters such as the wood name.
+Each layer is computed only when needed, and at most once per material, so intermediate layers shared by several outputs are only computed once. The time spent computing each layer is recorded, so textures can be profiled layer by layer.
+
+Operations never modify the layers they use.
+"""
+
+import time
+from collections import Counter
+from typing import NamedTuple, Callable, Dict, Tuple, Optional, Any, Union
+
+from PIL import Image, ImageDraw
+
+Color = Tuple[int, int, int, int]
+Box = Tuple[int, int, int, int]
+Position = Tuple[int, int]
+
+EMPTY: Color = (0, 0, 0, 0)
+SAME = object()  # Used as a paste mask, to use the pasted layer as its own mask
+
+timings = Counter()  # Seconds spent computing each layer, by '<graph>/<layer>', across all materials rendered by the current process
+
+
+class Layer(NamedTuple):
+    op: Callable[..., Image.Image]  # Called with the rendering compositor, followed by the images of all inputs
+    inputs: Tuple[str, ...]
+
+
+class Compositor:
+    """ Renders the layers of a single graph, for a single material. Parameters are used to format file names (i.e. '{wood}'), and can be used directly by operations """
+
+    def __init__(self, name: str, graph: Dict[str, Layer], load: Callable[[str], Image.Image], **params):
+        self.name = name
+        self.graph = graph
+        self.load = load
+        self.params = params
+        self.layers: Dict[str, Image.Image] = {}
+
+    def get(self, name: str) -> Image.Image:
+        if name not in self.layers:
+            layer = self.graph[name]
+            inputs = [self.get(i) for i in layer.inputs]
+            start = time.perf_counter()
+            self.layers[name] = layer.op(self, *inputs)
+            timings['%s/%s' % (self.name, name)] += time.perf_counter() - start
+        return self.layers[name]
+
+
+def load(file: str, mode: Optional[str] = 'RGBA') -> Layer:
+    """ Loads an image, where file is formatted with the material parameters. If mode is not None, the image is converted to that mode """
+    def op(c: Compositor) -> Image.Image:
+        img = c.load(file.format(**c.params))
+        return img.convert(mode) if mode is not None else img
+    return Layer(op, ())
+
+
+def blank(size: Position, color: Color = EMPTY) -> Layer:
+    return Layer(lambda c: Image.new('RGBA', size, color), ())
+
+
+def crop(layer: str, box: Box) -> Layer:
+    return Layer(lambda c, img: img.crop(box), (layer,))
+
+
+def transpose(layer: str, method: Image.Transpose) -> Layer:
+    return Layer(lambda c, img: img.transpose(method), (layer,))
+
+
+def fill(layer: str, box: Box, color: Color = EMPTY) -> Layer:
+    """ Fills a rectangle, including both corners, with a single color """
+    def op(c: Compositor, img: Image.Image) -> Image.Image:
+        img = img.copy()
+        ImageDraw.Draw(img).rectangle(box, fill=color)
+        return img
+    return Layer(op, (layer,))
+
+
+def paste(base: str, *pastes: Union[Tuple[str, Position], Tuple[str, Position, Optional[str]]]) -> Layer:
+    """ Pastes layers onto the base, in order. Each is a layer and a position, and optionally a mask layer, or None for no mask. By default, each layer is used as its own mask """
+    pastes = [(p[0], p[1], p[2] if len(p) > 2 else SAME) for p in pastes]
+    names = list(dict.fromkeys([base, *[p[0] for p in pastes], *[p[2] for p in pastes if isinstance(p[2], str)]]))
+
+    def op(c: Compositor, *images: Image.Image) -> Image.Image:
+        layers = dict(zip(names, images))
+        img = layers[base].copy()
+        for layer, position, mask in pastes:
+            img.paste(layers[layer], position, layers[layer] if mask is SAME else (layers[mask] if mask is not None else None))
+        return img
+    return Layer(op, tuple(names))
+
+
+def composite(base: str, *layers: str) -> Layer:
+    """ Alpha composites layers over the base, in order """
+    def op(c: Compositor, img: Image.Image, *overlays: Image.Image) -> Image.Image:
+        for overlay in overlays:
+            img = Image.alpha_composite(img, overlay)
+        return img
+    return Layer(op, (base, *layers))
+
+
+def apply(layer: str, function: Callable[..., Image.Image], *params: str) -> Layer:
+    """ Applies a function to a layer, called with the image, followed by the named material parameters """
+    return Layer(lambda c, img: function(img, *[c.params[p] for p in params]), (layer,))
+
+
+def render(name: str, graph: Dict[str, Layer], outputs: Dict[str, str], load: Callable[[str], Image.Image], save: Callable[[Image.Image, str], Any], **params):
+    """ Renders each output layer of a graph for a single material, and saves it to a file, formatted with the material parameters """
+    compositor = Compositor(name, graph, load, **params)
+    for layer, file in outputs.items():
+        save(compositor.get(layer), file.format(**params))
+
+
+def report(layer_timings: Dict[str, float]):
+    """ Prints the time spent on each layer, slowest first """
+    print('%-40s %10s' % ('Layer', 'Time (s)'))
+    for name, seconds in sorted(layer_timings.items(), key=lambda t: t[1], reverse=True):
+        print('%-40s %10.4f' % (name, seconds))
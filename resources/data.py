@@ -8,6 +8,7 @@ from mcresources.type_definitions import ResourceIdentifier
 
 from constants import *
 from recipes import fluid_ingredient
+import profiler
 
 
 class Size(Enum):
@@ -42,6 +43,7 @@ class Category(Enum):
 def generate(rm: ResourceManager):
 
     # === Metals ===
+    profiler.section('metals')
 
     for metal, metal_data in METALS.items():
         rm.data(('tfc', 'metals', metal), {
@@ -54,6 +56,7 @@ def generate(rm: ResourceManager):
         })
 
     # === Item Heats ===
+    profiler.section('item_heats')
 
     wrought_iron = METALS['wrought_iron']
     gold = METALS['gold']
@@ -136,6 +139,7 @@ def generate(rm: ResourceManager):
     # =========
     # ITEM TAGS
     # =========
+    profiler.section('item_tags')
 
     rm.item_tag('forge:ingots/cast_iron', 'minecraft:iron_ingot')
     rm.item_tag('forge:rods/wooden', '#tfc:twigs')
@@ -409,6 +413,7 @@ def generate(rm: ResourceManager):
     # ==========
     # BLOCK TAGS
     # ==========
+    profiler.section('block_tags')
 
     rm.block_tag('grass', *['tfc:grass/%s' % v for v in SOIL_BLOCK_VARIANTS], '#tfc:clay_grass')
     block_and_item_tag(rm, 'dirt', *['tfc:dirt/%s' % v for v in SOIL_BLOCK_VARIANTS], *['tfc:rooted_dirt/%s' % v for v in SOIL_BLOCK_VARIANTS])
@@ -722,6 +727,7 @@ def generate(rm: ResourceManager):
     # ==========
     # FLUID TAGS
     # ==========
+    profiler.section('fluid_tags')
 
     # Water
     # Any = Includes block waters like flowing, river water. These should never be present in fluid tanks
@@ -776,6 +782,7 @@ def generate(rm: ResourceManager):
     )], 'tfc:river_water')
 
     # Entity Tags
+    profiler.section('entity_tags')
 
     # Note, for all of these, weapons take priority over entity type
     # So, this is the damage the entity would do, if somehow they attacked you *without* a weapon.
@@ -817,6 +824,7 @@ def generate(rm: ResourceManager):
     rm.block_tag('quark:simple_harvest_blacklisted', '#tfc:crops')  # quark doesn't understand our crop block entities and so their right click harvesting doesn't reset growth, causing infinite food
 
     # Item Sizes
+    profiler.section('item_sizes')
 
     item_size(rm, 'logs', '#minecraft:logs', Size.very_large, Weight.medium)
     item_size(rm, 'quern', 'tfc:quern', Size.very_large, Weight.very_heavy)
@@ -868,6 +876,7 @@ def generate(rm: ResourceManager):
     item_size(rm, 'small_ore_pieces', '#tfc:small_ore_pieces', Size.small, Weight.light)
 
     # Food
+    profiler.section('food')
 
     food_item(rm, 'banana', 'tfc:food/banana', Category.fruit, 4, 0.2, 0, 2, fruit=1)
     food_item(rm, 'blackberry', 'tfc:food/blackberry', Category.fruit, 4, 0.2, 5, 4.9, fruit=0.75)
@@ -1021,6 +1030,7 @@ def generate(rm: ResourceManager):
     drinkable(rm, 'milk', '#tfc:milks', thirst=10, food={'hunger': 0, 'saturation': 0, 'dairy': 1.0})
 
     # Climate Ranges
+    profiler.section('climate_ranges')
 
     for berry, data in BERRIES.items():
         climate_range(rm, 'plant/%s_bush' % berry, temperature=(data.min_temp, data.max_temp, 0), hydration=(hydration_from_rainfall(data.min_rain), 100, 0))
@@ -1043,6 +1053,7 @@ def generate(rm: ResourceManager):
     fertilizer(rm, 'pure_potassium', 'tfc:pure_potassium', k=0.1)
 
     # Entities
+    profiler.section('entities')
     rm.data(('tfc', 'fauna', 'isopod'), fauna(distance_below_sea_level=20, climate=climate_config(max_temp=14)))
     rm.data(('tfc', 'fauna', 'crayfish'), fauna(distance_below_sea_level=5, climate=climate_config(min_temp=5, min_rain=125)))
     rm.data(('tfc', 'fauna', 'lobster'), fauna(distance_below_sea_level=1, climate=climate_config(max_temp=21)))
@@ -0,0 +1,525 @@
+"""
+Infrastructure for running the resource generators (assets.py, data.py, etc.)
+
+Each generator is a function which takes a ResourceManager. Normally they are all run, in order, against a single shared ResourceManager. This allows running them independently (i.e. in separate worker processes), and merging the shared state (buffered lang and tag entries, and file statistics) back into a single ResourceManager afterwards.
+
+It also allows running generators incrementally, by recording the inputs and outputs of each generator in a manifest, and skipping generators whose inputs have not changed since the last run.
+
+Finally, it provides resource managers which write resources in other ways: to multiple resource directories at once, validating against existing resources, or in memory.
+"""
+
+import contextlib
+import difflib
+import hashlib
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Callable, NamedTuple, Sequence, List, Optional, Any, Iterator, Set
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
+
+from mcresources import ResourceManager, utils
+from mcresources.tag import Tag
+from mcresources.type_definitions import ResourceLocation
+
+import advancements
+import assets
+import constants
+import data
+import dedupe_textures
+import format_lang
+import generate_book
+import i18n
+import patchouli
+import profiler
+import recipes
+import world_gen
+
+# The order here is the order generators are run in, and the order their lang and tag entries are merged in
+GENERATORS: Dict[str, Callable[[ResourceManager], None]] = {
+    'assets': assets.generate,
+    'data': data.generate,
+    'recipes': recipes.generate,
+    'worldgen': world_gen.generate,
+    'advancements': advancements.generate,
+}
+
+# Source files which, if modified, may change the output of each generator
+GENERATOR_INPUTS: Dict[str, Sequence[str]] = {
+    'assets': (__file__, assets.__file__, constants.__file__, dedupe_textures.__file__, dedupe_textures.DUPLICATES_PATH),
+    'data': (__file__, data.__file__, recipes.__file__, constants.__file__),
+    'recipes': (__file__, recipes.__file__, constants.__file__),
+    'worldgen': (__file__, world_gen.__file__, constants.__file__),
+    'advancements': (__file__, advancements.__file__, constants.__file__),
+}
+
+# Caches are kept outside of the resource directories, and are keyed by resource directory, as there may be several (i.e. with hotswap)
+MANIFEST_PATH = './.cache/datagen_manifest/%s.json'
+INDEX_PATH = './.cache/output_index/%s.json'
+
+
+class GeneratorResult(NamedTuple):
+    lang_buffer: Dict[str, Dict[str, str]]
+    tags_buffer: Dict[str, Dict[ResourceLocation, Tag]]
+    replaced_tags: Dict[str, Set[ResourceLocation]]  # Tags which the generator passed an explicit replace to, as only those override the replace of a tag when merged
+    new_files: int
+    modified_files: int
+    unchanged_files: int
+    error_files: int
+    files: List[str]  # Paths of all files written, relative to the resource directory
+    index_updates: List[Dict[str, list]]  # Updates to the output index of each resource directory
+    timings: List[profiler.Timing]  # Only present when profiling
+
+
+class BookResult(NamedTuple):
+    log: str  # Everything printed while generating the book
+    files: List[str]
+    index_updates: List[Dict[str, list]]
+
+
+class FanOutResourceManager(ResourceManager):
+    """
+    A resource manager which writes every resource to several resource directories, i.e. the main resource directory, and a hotswap directory.
+    Each resource is serialized only once, and the same text is written to each directory. Statistics are counted for the first (primary) directory, although errors writing to any directory are counted.
+    Files which are unchanged according to the output index of each directory are not read at all. Call save_indexes() once done writing.
+    """
+
+    def __init__(self, domain: str, resource_dirs: Sequence[Sequence[str]]):
+        super(FanOutResourceManager, self).__init__(domain, resource_dirs[0])
+        self.resource_dirs = [utils.str_path(d) for d in resource_dirs]
+        self.indexes = [OutputIndex(d) for d in self.resource_dirs]
+
+    def write(self, path_parts: Sequence[str], data_in):
+        data_in = utils.del_none({'__comment__': 'This file was automatically created by mcresources', **data_in})
+
+        root = len(self.resource_dir)
+        if list(path_parts[:root]) == self.resource_dir:
+            name = '/'.join(path_parts[root:]) + '.json'
+            data_digest = digest_json(data_in)
+            text = None
+            flags = []
+            for index in self.indexes:
+                if index.is_unchanged(name, data_digest):
+                    flags.append(utils.WriteFlag.UNCHANGED)
+                else:
+                    if text is None:
+                        text = json.dumps(data_in, indent=self.indent, ensure_ascii=self.ensure_ascii)
+                    flags.append(index.write(name, data_in, text, data_digest, self.on_error))
+        else:
+            flags = [utils.write(path_parts, data_in, self.indent, self.ensure_ascii, self.on_error)]  # Not within the resource directory, so only write it once
+
+        if utils.WriteFlag.ERROR in flags:
+            self.error_files += 1
+        elif flags[0] == utils.WriteFlag.NEW:
+            self.new_files += 1
+        elif flags[0] == utils.WriteFlag.MODIFIED:
+            self.modified_files += 1
+        elif flags[0] == utils.WriteFlag.UNCHANGED:
+            self.unchanged_files += 1
+
+
+    def save_indexes(self):
+        for index in self.indexes:
+            index.save()
+
+
+class ValidatingResourceManager(ResourceManager):
+    """ Validates that resources are unchanged, without writing them. Files which are unchanged according to the output index are not read at all """
+
+    def __init__(self, domain: str, resource_dir):
+        super(ValidatingResourceManager, self).__init__(domain, resource_dir)
+        self.validation_error = False
+        self.index = OutputIndex(self.resource_dir)
+
+    def write(self, path_parts, data_to_write):
+        data_to_write = utils.del_none({'__comment__': 'This file was automatically created by mcresources', **data_to_write})
+        path = os.path.join(*path_parts) + '.json'
+        try:
+            name = '/'.join(path_parts[len(self.resource_dir):]) + '.json'
+            data_digest = digest_json(data_to_write)
+            if self.index.is_unchanged(name, data_digest):
+                return
+            if not os.path.isfile(path):
+                print('Error: resource generation created new file \'%s\'' % path, file=sys.stderr)
+                self.error_files += 1
+                return
+            with open(path, 'r', encoding='utf-8') as file:
+                old_text = file.read()
+            if old_text == json.dumps(data_to_write, indent=self.indent, ensure_ascii=self.ensure_ascii):
+                self.index.record(name, data_digest)
+                return
+            old_data = json.loads(old_text)
+            if old_data != data_to_write:
+                old_text = json.dumps(old_data, indent=self.indent)
+                text = json.dumps(data_to_write, indent=self.indent)
+                diff = '\n'.join(difflib.unified_diff(old_text.split('\n'), text.split('\n'), 'old', 'new', n=1))
+                print('Error: resource generation modified file \'%s\' Diff:\n%s\n' % (path, diff), file=sys.stderr)
+                self.error_files += 1
+        except Exception as e:
+            self.on_error(path, e)
+            self.error_files += 1
+
+    def save_indexes(self):
+        self.index.save()
+
+
+class TreeDiff(NamedTuple):
+    added: List[str]  # Files which are not present in the tree
+    modified: List[str]
+    unchanged: List[str]
+
+
+class InMemoryResourceManager(ResourceManager):
+    """
+    A resource manager which captures every resource in memory, as the bytes which would be written, and never touches the disk.
+    Files are keyed by their path relative to the resource directory. Statistics are counted as if writing to an empty resource directory.
+    """
+
+    def __init__(self, domain: str, resource_dir: Sequence[str]):
+        super(InMemoryResourceManager, self).__init__(domain, resource_dir)
+        self.files: Dict[str, bytes] = {}
+
+    def write(self, path_parts: Sequence[str], data_in):
+        data_in = utils.del_none({'__comment__': 'This file was automatically created by mcresources', **data_in})
+        root = len(self.resource_dir)
+        name = '/'.join(path_parts[root:] if list(path_parts[:root]) == self.resource_dir else path_parts) + '.json'
+        content = json.dumps(data_in, indent=self.indent, ensure_ascii=self.ensure_ascii).encode('utf-8')
+        previous = self.files.get(name)
+        if previous is None:
+            self.new_files += 1
+        elif previous == content:
+            self.unchanged_files += 1
+        else:
+            self.modified_files += 1
+        self.files[name] = content
+
+    def diff(self, tree: Optional[str] = None) -> TreeDiff:
+        """ Compares the captured files against a tree, which is either a directory, or a zip file (such as a built jar). Defaults to the resource directory """
+        if tree is None:
+            tree = os.path.join(*self.resource_dir)
+        diff = TreeDiff([], [], [])
+        with ZipFile(tree) if tree.endswith(('.zip', '.jar')) else contextlib.nullcontext() as zf:
+            for name, content in self.files.items():
+                if zf is not None:
+                    existing = zf.read(name) if name in zf.NameToInfo else None
+                else:
+                    path = os.path.join(tree, name)
+                    if os.path.isfile(path):
+                        with open(path, 'rb') as f:
+                            existing = f.read()
+                    else:
+                        existing = None
+                if existing is None:
+                    diff.added.append(name)
+                elif existing.replace(b'\r\n', b'\n') == content or json.loads(existing) == json.loads(content):
+                    # Files which only differ in formatting or key order are unchanged, as with mcresources
+                    diff.unchanged.append(name)
+                else:
+                    diff.modified.append(name)
+        return diff
+
+    def tree_digest(self) -> str:
+        """ A digest of all captured files, independent of the order they were written in """
+        h = hashlib.sha256()
+        for name in sorted(self.files):
+            h.update(name.encode('utf-8') + b'\0')
+            h.update(hashlib.sha256(self.files[name]).digest())
+        return h.hexdigest()
+
+    def dump(self, dest: str):
+        """ Writes all captured files to a directory, or a zip file if dest ends with .zip. Zip files are written deterministically """
+        if dest.endswith('.zip'):
+            with ZipFile(dest, 'w', ZIP_DEFLATED) as zf:
+                for name in sorted(self.files):
+                    zf.writestr(ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), self.files[name], ZIP_DEFLATED)
+        else:
+            for name, content in self.files.items():
+                path = os.path.join(dest, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(content)
+
+
+class OutputIndex:
+    """
+    An index of the files previously written to a resource directory. Maps the path of each file (relative to the resource directory) to a digest of its content (see digest_json()), and the size and modification time of the file when it was written.
+    If a file's size and modification time match the index, it is assumed to still contain the indexed content, so it can be compared by digest without reading or parsing it.
+    """
+
+    def __init__(self, resource_dir: Sequence[str]):
+        self.resource_dir = utils.str_path(resource_dir)
+        self.path = INDEX_PATH % cache_key(self.resource_dir)
+        self.entries: Dict[str, list] = load_json(self.path)
+        self.updates: Dict[str, list] = {}
+
+    def is_unchanged(self, name: str, data_digest: str) -> bool:
+        """ If the file is known to contain content with the given digest """
+        entry = self.entries.get(name)
+        if entry is None or entry[0] != data_digest:
+            return False
+        try:
+            stat = os.stat(os.path.join(*self.resource_dir, name))
+        except OSError:
+            return False
+        return entry[1] == stat.st_size and entry[2] == stat.st_mtime_ns
+
+    def record(self, name: str, data_digest: str):
+        """ Records that the file contains content with the given digest """
+        stat = os.stat(os.path.join(*self.resource_dir, name))
+        self.entries[name] = self.updates[name] = [data_digest, stat.st_size, stat.st_mtime_ns]
+
+    def update(self, updates: Dict[str, list]):
+        self.entries.update(updates)
+        self.updates.update(updates)
+
+    def write(self, name: str, data_in, text: str, data_digest: str, on_error: Callable[[str, Exception], Any]) -> utils.WriteFlag:
+        """ Equivalent to utils.write(), using the already serialized text of data_in, for a file which is not unchanged according to the index """
+        path = os.path.join(*self.resource_dir, name)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            exists = False
+            if os.path.isfile(path):
+                with open(path, 'r', encoding='utf-8') as file:
+                    old_text = file.read()
+                if old_text == text:
+                    self.record(name, data_digest)
+                    return utils.WriteFlag.UNCHANGED
+                if json.loads(old_text) == data_in:
+                    return utils.WriteFlag.UNCHANGED  # Equivalent, but not identical, so it is not indexed
+                exists = True
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(text)
+            self.record(name, data_digest)
+            return utils.WriteFlag.MODIFIED if exists else utils.WriteFlag.NEW
+        except Exception as e:
+            on_error(path, e)
+            return utils.WriteFlag.ERROR
+
+    def save(self):
+        """ Saves any updates to the index. Existing entries are re-read first, so multiple indexes of the same directory can be saved one after another """
+        if self.updates:
+            entries = load_json(self.path)
+            entries.update(self.updates)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(entries))
+            self.updates = {}
+
+
+class Manifest:
+    """
+    Records, for a single output directory, a digest of the inputs of each generator, along with the files it wrote and any lang and tag entries it produced.
+    A generator is up to date if the digest of its inputs is unchanged, and all the files it wrote still exist. Up to date generators can be skipped, and their recorded lang and tag entries used instead.
+    """
+
+    def __init__(self, resource_dirs: Sequence[Sequence[str]]):
+        self.resource_dirs = [utils.str_path(d) for d in resource_dirs]
+        self.path = MANIFEST_PATH % cache_key(self.resource_dirs[0])
+        self.entries = load_json(self.path)
+
+    def is_up_to_date(self, name: str, inputs: Sequence[str]) -> bool:
+        if name not in self.entries or self.entries[name]['inputs'] != digest(inputs) or self.entries[name]['dirs'] != self.dir_names():
+            return False
+        return all(os.path.isfile(os.path.join(*resource_dir, path)) for resource_dir in self.resource_dirs for path in self.entries[name]['files'])
+
+    def result(self, name: str) -> GeneratorResult:
+        entry = self.entries[name]
+        tags_buffer = {tag_type: {utils.resource_location(tag_res): make_tag(tag['replace'], tag['values']) for tag_res, tag in tags.items()} for tag_type, tags in entry['tags'].items()}
+        replaced_tags = {tag_type: {utils.resource_location(tag_res) for tag_res, tag in tags.items() if tag['explicit_replace']} for tag_type, tags in entry['tags'].items()}
+        return GeneratorResult(entry['lang'], tags_buffer, replaced_tags, 0, 0, 0, 0, entry['files'], [{} for _ in self.resource_dirs], [])
+
+    def update(self, name: str, inputs: Sequence[str], files: List[str], lang_buffer: Dict[str, Dict[str, str]] = None, tags_buffer: Dict[str, Dict[ResourceLocation, Tag]] = None, replaced_tags: Dict[str, Set[ResourceLocation]] = None):
+        replaced_tags = replaced_tags or {}
+        self.entries[name] = {
+            'inputs': digest(inputs),
+            'dirs': self.dir_names(),
+            'files': files,
+            'lang': lang_buffer or {},
+            'tags': {tag_type: {tag_res.join(): {'replace': tag.replace, 'explicit_replace': tag_res in replaced_tags.get(tag_type, ()), 'values': tag.values} for tag_res, tag in tags.items()} for tag_type, tags in (tags_buffer or {}).items()},
+        }
+
+    def dir_names(self) -> List[str]:
+        return ['/'.join(d) for d in self.resource_dirs]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.entries, ensure_ascii=False))
+
+
+def book_inputs(lang: str) -> Sequence[str]:
+    return __file__, generate_book.__file__, patchouli.__file__, i18n.__file__, data.__file__, recipes.__file__, constants.__file__, './resources/lang/%s.json' % lang
+
+
+def lang_inputs(langs: Sequence[str]) -> Sequence[str]:
+    return __file__, format_lang.__file__, *['./src/main/resources/assets/%s/lang/%s.json' % (namespace, lang) for namespace in ('minecraft', 'tfc') for lang in langs]
+
+
+def run(name: str, rm: ResourceManager, profile: Optional[profiler.Profiler] = None):
+    """ Runs a single generator against rm, profiling it if a profiler is present """
+    if profile is not None:
+        profile.profile(name, GENERATORS[name], rm)
+    else:
+        GENERATORS[name](rm)
+
+
+def generate(name: str, domain: str, resource_dirs: Sequence[Sequence[str]], profile: bool = False) -> GeneratorResult:
+    """ Runs a single generator against a fresh resource manager. Lang and tag entries are not flushed, but returned, so they can be merged. """
+    rm = FanOutResourceManager(domain, resource_dirs)
+    files = record_writes(rm)
+    replaced_tags = record_tag_replaces(rm)
+    profile = profiler.Profiler() if profile else None
+    if profile is not None:
+        profile.wrap(rm)
+    run(name, rm, profile)
+    return GeneratorResult(dict(rm.lang_buffer), dict(rm.tags_buffer), dict(replaced_tags), rm.new_files, rm.modified_files, rm.unchanged_files, rm.error_files, list(dict.fromkeys(files)), [index.updates for index in rm.indexes], profile.timings if profile is not None else [])
+
+
+def generate_all(rm: ResourceManager, names: Sequence[str], jobs: int = 1, manifest: Optional[Manifest] = None, profile: bool = False) -> List[profiler.Timing]:
+    """
+    Runs each generator independently, and merges the results into rm. Results are merged in the order of names, so the output is identical to running them all against rm.
+    :param jobs: If > 1, each generator runs in its own worker process.
+    :param manifest: If present, generators which are up to date will be skipped.
+    :param profile: If true, each generator which is run is profiled, and the timings are returned.
+    """
+    results = {}
+    if manifest is not None:
+        for name in names:
+            if manifest.is_up_to_date(name, GENERATOR_INPUTS[name]):
+                print('Skipping %s, as it is up to date' % name)
+                results[name] = manifest.result(name)
+
+    pending = [name for name in names if name not in results]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [(name, pool.submit(generate, name, rm.domain, resource_dirs(rm), profile)) for name in pending]
+            for name, future in futures:
+                results[name] = future.result()
+    else:
+        for name in pending:
+            results[name] = generate(name, rm.domain, resource_dirs(rm), profile)
+
+    if manifest is not None:
+        for name in pending:
+            result = results[name]
+            manifest.update(name, GENERATOR_INPUTS[name], result.files, result.lang_buffer, result.tags_buffer, result.replaced_tags)
+        manifest.save()
+
+    for name in names:
+        merge(rm, results[name])
+    return [timing for name in names for timing in results[name].timings]
+
+
+def generate_book_lang(lang: str, local: Optional[str], reverse_translate: bool, resource_dirs: Sequence[Sequence[str]]) -> BookResult:
+    """ Generates the book for a single language. Output is captured and returned, so output from books generated in parallel can be printed in order """
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        rm = FanOutResourceManager('tfc', resource_dirs)
+        files = record_writes(rm)
+        generate_book.main(lang, local, False, rm, reverse_translate)
+    return BookResult(log.getvalue(), list(dict.fromkeys(files)), [index.updates for index in rm.indexes])
+
+
+def generate_books(langs: Sequence[str], local: Optional[str], reverse_translate: bool, resource_dirs: Sequence[Sequence[str]], jobs: int = 1) -> Iterator[BookResult]:
+    """ Generates the book for each language, in parallel if jobs > 1. Results are yielded in the order of langs, as soon as each is available """
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(generate_book_lang, lang, local, reverse_translate, resource_dirs) for lang in langs]
+            for future in futures:
+                yield future.result()
+    else:
+        for lang in langs:
+            yield generate_book_lang(lang, local, reverse_translate, resource_dirs)
+
+
+def merge(rm: ResourceManager, result: GeneratorResult):
+    """ Merges the result of a generator into rm, as if the generator had been run with rm directly """
+    for language, entries in result.lang_buffer.items():
+        rm.lang_buffer[language].update(entries)
+
+    for tag_type, tags in result.tags_buffer.items():
+        for tag_res, tag in tags.items():
+            if tag_res in rm.tags_buffer[tag_type]:
+                existing = rm.tags_buffer[tag_type][tag_res]
+                existing.add_all(tag.values)
+                if tag_res in result.replaced_tags.get(tag_type, ()):
+                    existing.replace = tag.replace  # As with rm.tag(), only an explicit replace overrides, and the last one wins
+            else:
+                rm.tags_buffer[tag_type][tag_res] = tag
+
+    if isinstance(rm, FanOutResourceManager):
+        for index, updates in zip(rm.indexes, result.index_updates):
+            index.update(updates)
+
+    rm.new_files += result.new_files
+    rm.modified_files += result.modified_files
+    rm.unchanged_files += result.unchanged_files
+    rm.error_files += result.error_files
+
+
+def resource_dirs(rm: ResourceManager) -> Sequence[Sequence[str]]:
+    return rm.resource_dirs if isinstance(rm, FanOutResourceManager) else [rm.resource_dir]
+
+
+def record_writes(rm: ResourceManager) -> List[str]:
+    """ Records the path, relative to the resource directory, of every file written by rm """
+    files = []
+    write = rm.write
+
+    def record(path_parts: Sequence[str], data_in):
+        files.append(os.path.relpath(os.path.join(*path_parts) + '.json', os.path.join(*rm.resource_dir)).replace('\\', '/'))
+        write(path_parts, data_in)
+
+    rm.write = record
+    return files
+
+
+def record_tag_replaces(rm: ResourceManager) -> Dict[str, Set[ResourceLocation]]:
+    """ Records, for each tag type, every tag which rm.tag() was called with an explicit replace for """
+    replaced_tags = {}
+    tag = rm.tag
+
+    def record(name_parts, root_domain, *values, replace: bool = None):
+        if replace is not None:
+            replaced_tags.setdefault('/'.join(utils.str_path(root_domain)), set()).add(utils.resource_location(rm.domain, name_parts))
+        tag(name_parts, root_domain, *values, replace=replace)
+
+    rm.tag = record
+    return replaced_tags
+
+
+def load_json(path: str) -> dict:
+    if os.path.isfile(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def make_tag(replace: bool, values: list) -> Tag:
+    tag = Tag(replace)
+    tag.values = values
+    return tag
+
+
+def digest_json(data_in) -> str:
+    """ A digest of json data, using a compact serialization, as that is much faster than serializing with indentation """
+    return hashlib.blake2b(json.dumps(data_in, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def cache_key(resource_dir: Sequence[str]) -> str:
+    """ A file name which identifies a resource directory """
+    path = os.path.abspath(os.path.join(*resource_dir))
+    return hashlib.sha256(path.encode('utf-8')).hexdigest()[:16]
+
+
+def digest(paths: Sequence[str]) -> str:
+    """ A digest of the content of a collection of files """
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(os.path.relpath(path).replace('\\', '/').encode('utf-8') + b'\0')
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+        h.update(b'\0')
+    return h.hexdigest()
@@ -0,0 +1,178 @@
+"""
+Deduplication of textures referenced by generated models.
+
+Some textures are intended to be copies of another, such as item textures which are the same as the block texture they depict. Generated block and item models reference the canonical texture instead of any of its duplicates.
+As textures are only loaded and stitched into the block atlas when a model references them, duplicates are then never loaded.
+
+Deduplication is opt-in: only the textures listed in DUPLICATES_PATH, a map of each duplicate to its canonical texture, are replaced. Many textures are identical by coincidence (i.e. the last stage of a crop, and the wild crop), and would silently ignore any later edit, or resource pack, if they were deduplicated.
+Generating textures reports every candidate duplicate which is not listed, and validating assets checks that every listed duplicate is still identical to its canonical texture.
+Textures which are referenced by name outside of generated models, by Java code, hand written models, or other resources (such as recipes), are never candidates, as they would still be loaded, or may rely on a model to be stitched.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Optional, Set, Tuple, Sequence, List, Callable
+
+import numpy
+from PIL import Image, UnidentifiedImageError
+from mcresources import ResourceManager
+
+DUPLICATES_PATH = './resources/texture_duplicates.json'
+RESOURCES_DIR = './src/main/resources/'
+TEXTURES_DIR = './src/main/resources/assets/tfc/textures/'
+MODELS_DIR = './src/main/resources/assets/tfc/models/'
+JAVA_DIR = './src/main/java/'
+TEXTURE_DIRS = ('block', 'item')  # Textures which are stitched into the block atlas, when referenced by a model
+
+JAVA_TEXTURE = re.compile(r'"((?:block|item)/[a-z0-9_/]*)"')
+RESOURCE_TEXTURE = re.compile(r'"tfc:((?:block|item)/[a-z0-9_/]+)"')
+GENERATED_COMMENT = 'This file was automatically created by mcresources'
+
+
+def main(list_candidates: bool = False):
+    duplicates = load_duplicates()
+    for texture, canonical in verify(duplicates):
+        print('Duplicate texture %s is no longer identical to %s, remove it from %s' % (texture, canonical, DUPLICATES_PATH))
+    candidates = {texture: canonical for texture, canonical in find_duplicates().items() if texture not in duplicates}
+    if list_candidates:
+        for texture, canonical in candidates.items():
+            print('Candidate duplicate texture: %s of %s' % (texture, canonical))
+    report(duplicates)
+    print('Candidate duplicates, not deduplicated = %d' % len(candidates))
+
+
+def find_duplicates() -> Dict[str, str]:
+    """ Finds all identical textures which could be deduplicated, and returns a map of each duplicate to its canonical texture """
+    groups = defaultdict(list)
+    for texture_dir in TEXTURE_DIRS:
+        for root, _, files in os.walk(TEXTURES_DIR + texture_dir):
+            for file in files:
+                if file.endswith('.png'):
+                    path = os.path.join(root, file)
+                    key = texture_key(path)
+                    if key is not None:
+                        groups[key].append(texture_id(path))
+
+    pinned = pinned_textures()
+    duplicates = {}
+    for group in groups.values():
+        if len(group) > 1:
+            # Prefer a pinned texture as the canonical one, as it will be loaded anyway
+            canonical, *others = sorted(group, key=lambda t: (not is_pinned(t, pinned), t))
+            for texture in others:
+                if not is_pinned(texture, pinned):
+                    duplicates[texture] = canonical
+    return dict(sorted(duplicates.items()))
+
+
+def verify(duplicates: Dict[str, str]) -> List[Tuple[str, str]]:
+    """ Returns every duplicate, and its canonical texture, which are missing or no longer identical """
+    mismatched = []
+    for texture, canonical in duplicates.items():
+        key = texture_key(texture_path(texture))
+        if key is None or key != texture_key(texture_path(canonical)):
+            mismatched.append((texture, canonical))
+    return mismatched
+
+
+def texture_key(path: str) -> Optional[Tuple[Tuple[int, ...], str, Optional[str]]]:
+    """ A key which is equal for textures with identical pixels and animation metadata, or None if the texture cannot be read """
+    try:
+        with Image.open(path) as img:
+            pixels = numpy.asarray(img.convert('RGBA'))
+    except (UnidentifiedImageError, FileNotFoundError):
+        return None
+    meta = None
+    if os.path.isfile(path + '.mcmeta'):
+        with open(path + '.mcmeta', 'rb') as f:
+            meta = hashlib.sha256(f.read()).hexdigest()
+    return pixels.shape, hashlib.sha256(pixels.tobytes()).hexdigest(), meta
+
+
+def texture_path(texture: str) -> str:
+    return TEXTURES_DIR + texture[len('tfc:'):] + '.png'
+
+
+def texture_id(path: str) -> str:
+    return 'tfc:' + os.path.relpath(path, TEXTURES_DIR).replace('\\', '/')[:-len('.png')]
+
+
+def pinned_textures() -> Tuple[Set[str], Tuple[str, ...]]:
+    """ Textures which are referenced by name outside of generated models. Returns a set of texture paths, and a tuple of path prefixes, as Java code may build a texture path from a prefix """
+    pinned = set()
+    for root, _, files in os.walk(JAVA_DIR):
+        for file in files:
+            with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
+                pinned.update(JAVA_TEXTURE.findall(f.read()))
+    for root, dirs, files in os.walk(RESOURCES_DIR):
+        dirs[:] = [d for d in dirs if d != 'blockstates']  # Blockstates only reference models
+        for file in files:
+            if file.endswith('.json'):
+                with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
+                    text = f.read()
+                if not (os.path.abspath(root).startswith(os.path.abspath(MODELS_DIR)) and GENERATED_COMMENT in text):  # Generated models are replaced, but hand written models are not
+                    pinned.update(RESOURCE_TEXTURE.findall(text))
+    return {p for p in pinned if not p.endswith('/')}, tuple(p for p in pinned if p.endswith('/'))
+
+
+def is_pinned(texture: str, pinned: Tuple[Set[str], Tuple[str, ...]]) -> bool:
+    paths, prefixes = pinned
+    path = texture[len('tfc:'):]
+    return path in paths or path.startswith(prefixes)
+
+
+def load_duplicates() -> Dict[str, str]:
+    if os.path.isfile(DUPLICATES_PATH):
+        with open(DUPLICATES_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def deduplicating(generator: Callable[[ResourceManager], None]) -> Callable[[ResourceManager], None]:
+    """ Wraps a generator, such that every model it writes references canonical textures instead of duplicates. The write function of the resource manager is restored afterwards """
+    @functools.wraps(generator)
+    def generate(rm: ResourceManager):
+        write = rm.write
+        apply(rm)
+        try:
+            generator(rm)
+        finally:
+            rm.write = write
+    return generate
+
+
+def apply(rm: ResourceManager, duplicates: Dict[str, str] = None):
+    """ Rewrites the textures of every model written by rm, to reference canonical textures instead of duplicates. This replaces rm.write, which is the responsibility of the caller to restore """
+    duplicates = load_duplicates() if duplicates is None else duplicates
+    write = rm.write
+    root = len(rm.resource_dir)
+
+    def deduplicated_write(path_parts: Sequence[str], data_in):
+        if len(path_parts) > root + 2 and path_parts[root] == 'assets' and path_parts[root + 2] == 'models' and isinstance(data_in.get('textures'), dict):
+            data_in = {**data_in, 'textures': {key: duplicates.get(texture, texture) for key, texture in data_in['textures'].items()}}
+        write(path_parts, data_in)
+
+    rm.write = deduplicated_write
+
+
+def report(duplicates: Dict[str, str]):
+    """ Prints the number of duplicate textures, and the bytes saved by not loading them. Duplicates still referenced by hand written models are not counted """
+    referenced = set()
+    for root, _, files in os.walk(MODELS_DIR):
+        for file in files:
+            with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
+                model = json.load(f)
+            if model.get('__comment__') != GENERATED_COMMENT:
+                referenced.update(t for t in model.get('textures', {}).values() if isinstance(t, str))
+
+    saved = [texture for texture in duplicates if texture not in referenced]
+    size = sum(os.path.getsize(texture_path(texture)) for texture in saved if os.path.isfile(texture_path(texture)))
+    print('Duplicate textures = %d, Canonical = %d, Still referenced = %d, Bytes saved = %d' % (len(duplicates), len(set(duplicates.values())), len(duplicates) - len(saved), size))
+
+
+if __name__ == '__main__':
+    main(list_candidates=True)
@@ -76,6 +76,7 @@ opencc -i zh_cn.json -o zh_tw.json -c s2twp.json
 
 """
 
+import functools
 from argparse import ArgumentParser
 from typing import Optional
 
@@ -112,26 +113,32 @@ def main_with_args():
     main(args.translate, args.local, False)
 
 
-def main(translate_lang: str, local_minecraft_dir: Optional[str], validate: bool, validating_rm: ResourceManager = None, reverse_translate: bool = False):
+def main(translate_lang: str, local_minecraft_dir: Optional[str], validate: bool, rm: ResourceManager = None, reverse_translate: bool = False):
     LocalInstance.INSTANCE_DIR = local_minecraft_dir
 
-    rm = ResourceManager('tfc', './src/main/resources')
-    if validate:
-        rm = validating_rm
+    if rm is None:
+        rm = ResourceManager('tfc', './src/main/resources')
     i18n = I18n(translate_lang, validate)
+    book = field_guide()
 
     print('Writing book at %s' % translate_lang)
-    make_book(rm, i18n, local_instance=False, reverse_translate=reverse_translate)
+    book.build(rm, i18n, local_instance=False, reverse_translate=reverse_translate)
 
     i18n.flush()
 
     if LocalInstance.wrap(rm):
         print('Copying %s book into local instance at: %s' % (translate_lang, LocalInstance.INSTANCE_DIR))
-        make_book(rm, I18n(translate_lang, validate), local_instance=True)
+        book.build(rm, i18n, local_instance=True)
 
 
-def make_book(rm: ResourceManager, i18n: I18n, local_instance: bool = False, reverse_translate: bool = False):
-    book = Book(rm, 'field_guide', {}, i18n, local_instance, reverse_translate)
+@functools.lru_cache(maxsize=None)
+def field_guide() -> Book:
+    """ The structure of the book is independent of language, so it is only made once, and shared when building each language """
+    return make_book()
+
+
+def make_book() -> Book:
+    book = Book('field_guide', {})
 
     book.template('multimultiblock', custom_component(0, 0, 'MultiMultiBlockComponent', {'multiblocks': '#multiblocks'}), text_component(0, 115))
 
@@ -1263,7 +1270,8 @@ def make_book(rm: ResourceManager, i18n: I18n, local_instance: bool = False, rev
         )),
     ))
 
-    book.build()
+    book.validate()
+    return book
 
 
 def detail_crop(crop: str) -> str:
@@ -1,13 +1,15 @@
 import os
 import shutil
+from argparse import ArgumentParser
 from typing import Tuple
 
 import gradients
+import optimize_png
 
 SRC = '../src/main/resources/assets/tfc/textures/colormap/'
 
 
-def main():
+def main(optimize: bool = False):
     make('sky.png', (0, 0, '#6697E7'), (255, 0, '#7ca5f7'), (0, 255, '#dec797'), (255, 255, '#ABAAE3'), (64, 64, '#6597CE'))
     make('fog.png', (0, 0, '#8FB1E9'), (255, 0, '#b4a1e7'), (0, 255, '#EDCC97'), (255, 255, '#d7d6f6'), (64, 64, '#b0d2f7'))
 
@@ -22,6 +24,9 @@ def main():
 
     copy('water.png', 'water_fog.png')
 
+    if optimize:
+        optimize_png.optimize_all([os.path.join(SRC, image) for image in sorted(os.listdir(SRC)) if image.endswith('.png')])
+
     print('Done')
 
 
@@ -34,4 +39,6 @@ def copy(src: str, dest: str):
 
 
 if __name__ == '__main__':
-    main()
+    parser = ArgumentParser()
+    parser.add_argument('--optimize', action='store_true', help='Losslessly optimize all colormaps')
+    main(parser.parse_args().optimize)
@@ -1,281 +1,421 @@
-from PIL import Image, ImageDraw, ImageEnhance, ImageOps
+import functools
+import hashlib
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Sequence, List, Mapping, Any, Callable, Optional, Dict, Tuple
+
+import numpy
+from PIL import Image, ImageEnhance, ImageOps
 from PIL.Image import Transpose
 
 import colorsys
+import compositing
+import optimize_png
+from compositing import load, blank, crop, transpose, fill, paste, composite, apply
 from constants import *
 
 path = './src/main/resources/assets/tfc/textures/'
 mc_path = './src/main/resources/assets/minecraft/textures/'
 templates = './resources/texture_templates/'
 
+MANIFEST_PATH = './.cache/texture_manifest.json'
+
+counts = Counter()  # Images written, unchanged and skipped, by the current process
+outputs: List[str] = []  # Images written, unchanged and skipped, by the current process
+manifest: Optional['Manifest'] = None  # When generating incrementally, the manifest of the last run
+step: Optional[Dict[str, Dict[str, str]]] = None  # The inputs and outputs of the current build step, when generating incrementally
+
+
+class Manifest:
+    """
+    Records, for each build step (a builder, and its parameters), the digests of the images it read, and the images it wrote.
+    A step is up to date if all of its inputs and outputs are unchanged since the last run, in which case it is skipped. Any change to this file, or to the compositing engine, invalidates every step.
+    """
+
+    def __init__(self):
+        self.code = '%s/%s' % (file_digest(__file__), file_digest(compositing.__file__))
+        entries = {}
+        if os.path.isfile(MANIFEST_PATH):
+            with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        self.steps: Dict[str, Any] = entries.get('steps', {}) if entries.get('code') == self.code else {}
+        self.updates: Dict[str, Any] = {}  # The steps run by the current process
+
+    def is_up_to_date(self, key: str) -> bool:
+        entry = self.steps.get(key)
+        return entry is not None and all(file_digest(file) == digest for file, digest in (*entry['inputs'].items(), *entry['outputs'].items()))
+
+    def save(self, steps: Dict[str, Any]):
+        os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+        with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'code': self.code, 'steps': steps}))
+
+
+def build(builder: Callable, *args):
+    """ Runs a single build step. When generating incrementally, the step is skipped if it is up to date, and otherwise its inputs and outputs are recorded """
+    global step
+    if manifest is None:
+        builder(*args)
+        return
+    key = builder.__name__ + repr(args)
+    if manifest.is_up_to_date(key):
+        manifest.updates[key] = manifest.steps[key]
+        counts['skipped'] += len(manifest.steps[key]['outputs'])
+        outputs.extend(manifest.steps[key]['outputs'])
+        return
+    step = {'inputs': {}, 'outputs': {}}
+    try:
+        builder(*args)
+        manifest.updates[key] = step
+    finally:
+        step = None
+
+
+def file_digest(file: str) -> Optional[str]:
+    if not os.path.isfile(file):
+        return None
+    with open(file, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def open_image(file: str) -> Image.Image:
+    """ Opens an image. Templates never change during generation, so they are decoded once, and a copy is returned """
+    if step is not None:
+        step['inputs'][file] = file_digest(file)
+    if file.startswith(templates):
+        return load_template(file).copy()
+    return Image.open(file)
+
+
+@functools.lru_cache(maxsize=256)
+def load_template(file: str) -> Image.Image:
+    img = Image.open(file)
+    img.load()
+    return img
+
+
+def save_image(img: Image.Image, file: str):
+    """ Saves an image as a png, only writing it if the pixels of the existing image have changed """
+    if os.path.isfile(file) and same_pixels(img, file):
+        counts['unchanged'] += 1
+    else:
+        img.save(file)
+        counts['written'] += 1
+    outputs.append(file)
+    if step is not None:
+        step['outputs'][file] = file_digest(file)
+
+
+def same_pixels(img: Image.Image, file: str) -> bool:
+    with Image.open(file) as original:
+        return original.size == img.size and numpy.array_equal(numpy.asarray(original.convert('RGBA')), numpy.asarray(img.convert('RGBA')))
+
 
 def overlay_image(front_file_dir, back_file_dir, result_dir):
-    foreground = Image.open(front_file_dir + '.png')
-    background = Image.open(back_file_dir + '.png').convert('RGBA')
+    foreground = open_image(front_file_dir + '.png')
+    background = open_image(back_file_dir + '.png').convert('RGBA')
     background.paste(foreground, (0, 0), foreground.convert('RGBA'))
-    background.save(result_dir + '.png')
+    save_image(background, result_dir + '.png')
+
+
+BLACK = (0, 0, 0, 255)
+SHADE = (0, 0, 0, 180)
+
+CHEST = {
+    'log': load(path + 'block/wood/log/{wood}.png'),
+    'sheet': load(path + 'block/wood/sheet/{wood}.png'),
+    'blank': blank((64, 64)),
+
+    # Single chest
+    'log_square': crop('log', (0, 0, 14, 14)),
+    'sheet_square': crop('sheet', (0, 0, 14, 14)),
+    'frame': fill('log_square', (1, 1, 12, 12)),
+    'top': paste('sheet_transposed', ('frame', (0, 0))),
+    'sheet_transposed': transpose('sheet_square', Transpose.TRANSVERSE),
+    'log_section': fill('log_square', (0, 1, 14, 14)),
+    'side': paste('side_cleared', ('log_section', (0, 4)), ('log_section', (0, 13))),
+    'side_cleared': fill('top', (0, 0, 14, 3)),
+    'rim': paste('rim_cleared', ('log_section', (0, 9))),
+    'rim_cleared': fill('top', (0, 0, 14, 9)),
+    'underside': fill('top', (2, 2, 11, 11), BLACK),
+    'cover': composite('top', 'shade'),
+    'shade': paste('blank_square', ('shade_square', (2, 2))),
+    'shade_square': blank((10, 10), SHADE),
+    'blank_square': blank((14, 14)),
+    'handle': load(templates + 'chest/handle.png'),
+    'normal': paste(
+        'blank',
+        ('handle', (0, 0)), ('cover', (14, 0)), ('top', (28, 0)),
+        *[p for i in range(0, 4) for p in (('rim', (i * 14, 5)), ('side', (i * 14, 29)))],
+        ('top', (14, 19)), ('underside', (28, 19))
+    ),
+    'trapped': composite('normal', 'trapped_overlay'),
+    'trapped_overlay': load(templates + 'chest/trapped_overlay.png', None),
+
+    # Double chests, where the left and right textures each contain one half of the chest
+    'log_rect': crop('log', (0, 0, 15, 14)),
+    'sheet_rect': crop('sheet', (0, 0, 15, 14)),
+    'top_right': paste('sheet_rect', ('top_right_frame', (0, 0))),
+    'top_right_frame': fill('log_rect', (0, 1, 13, 12)),
+    'top_left': paste('sheet_rect', ('top_left_frame', (0, 0))),
+    'top_left_frame': fill('log_rect', (1, 1, 15, 12)),
+    'underside_right': fill('top_right', (0, 2, 12, 11), BLACK),
+    'underside_left': fill('top_left', (2, 2, 15, 11), BLACK),
+    'cover_right': composite('top_right', 'shade_right'),
+    'shade_right': paste('blank_rect', ('shade_rect', (0, 2))),
+    'cover_left': composite('top_left', 'shade_left'),
+    'shade_left': paste('blank_rect', ('shade_rect', (2, 2))),
+    'shade_rect': blank((13, 10), SHADE),
+    'blank_rect': blank((15, 14)),
+    'rim_right': paste('rim_right_cleared', ('log_section', (0, 9)), ('log_section', (1, 9))),
+    'rim_right_cleared': fill('top_right', (0, 0, 15, 9)),
+    'rim_left': paste('rim_left_cleared', ('log_section', (0, 9)), ('log_section', (1, 9))),
+    'rim_left_cleared': fill('top_left', (0, 0, 15, 9)),
+    'side_right': paste('side_right_cleared', ('log_section', (0, 4)), ('log_section', (1, 4)), ('log_section', (0, 13)), ('log_section', (1, 13))),
+    'side_right_cleared': fill('top_right', (0, 0, 15, 3)),
+    'side_left': paste('side_left_cleared', ('log_section', (0, 4)), ('log_section', (1, 4)), ('log_section', (0, 13)), ('log_section', (1, 13))),
+    'side_left_cleared': fill('top_left', (0, 0, 15, 3)),
+    'handle_left': load(templates + 'chest/handle_left.png', None),
+    'normal_left': paste(
+        'blank',
+        ('handle_left', (0, 0)), ('cover_right', (14, 0)), ('top_right', (29, 0)),
+        ('rim_right', (14, 5)), ('rim', (29, 5)), ('rim_left', (43, 5)),
+        ('top_right', (14, 19)), ('underside_right', (29, 19)),
+        ('side', (29, 29)), ('side_right', (14, 29)), ('side_left', (43, 29))
+    ),
+    'trapped_left': composite('normal_left', 'trapped_left_overlay'),
+    'trapped_left_overlay': load(templates + 'chest/trapped_left_overlay.png', None),
+    'handle_right': load(templates + 'chest/handle_right.png', None),
+    'normal_right': paste(
+        'blank',
+        ('handle_right', (0, 0)), ('cover_left', (14, 0)), ('top_left', (29, 0)),
+        ('rim', (0, 5)), ('rim_left', (14, 5)), ('rim_right', (43, 5)),
+        ('top_left', (14, 19)), ('cover_left', (29, 19)), ('underside_left', (29, 19)),
+        ('side', (0, 29)), ('side_left', (14, 29), 'side_right'), ('side_right', (43, 29), 'side_left')
+    ),
+    'trapped_right': composite('normal_right', 'trapped_right_overlay'),
+    'trapped_right_overlay': load(templates + 'chest/trapped_right_overlay.png', None),
+}
+
+SIGN = {
+    'log': load(path + 'block/wood/log/{wood}.png'),
+    'planks': load(path + 'block/wood/planks/{wood}.png'),
+    'sign': paste(
+        'blank',
+        *[('planks', coord, None) for coord in ((0, 0), (16, 0), (32, 0), (48, 0))],
+        ('log', (0, 16), None)
+    ),
+    'blank': blank((64, 32)),
+    'head': apply('head_template', lambda img, color: put_on_all_pixels(img, color), 'plank_color'),
+    'head_template': load(templates + 'sign_head.png', None),
+    'mast': apply('mast_template', lambda img, color: put_on_all_pixels(img, color), 'log_color'),
+    'mast_template': load(templates + 'sign_mast.png', None),
+    'sign_item': composite('mast', 'head'),
+}
+
+HORSE_CHEST = {
+    layer: value for variant in ('chest', 'barrel') for layer, value in {
+        variant: paste('blank', ('%s_frame' % variant, (26, 21)), ('%s_body' % variant, (26, 21)), ('%s_overlay' % variant, (26, 21))),
+        '%s_overlay' % variant: load(templates + 'horse_%s_overlay.png' % variant),
+        '%s_frame' % variant: apply('%s_frame_template' % variant, lambda img, color: put_on_all_pixels(img, color), 'log_color'),
+        '%s_frame_template' % variant: load(templates + 'horse_%s_log.png' % variant),
+        '%s_body' % variant: apply('%s_body_template' % variant, lambda img, color: put_on_all_pixels(img, color), 'plank_color'),
+        '%s_body_template' % variant: load(templates + 'horse_%s_sheet.png' % variant),
+    }.items()
+}
+HORSE_CHEST['blank'] = blank((64, 64))
+
 
 def create_chest(wood: str):
-    log = Image.open(path + 'block/wood/log/%s' % wood + '.png').convert('RGBA').crop((0, 0, 14, 14))
-    sheet = Image.open(path + 'block/wood/sheet/%s' % wood + '.png').convert('RGBA').crop((0, 0, 14, 14))
-    empty = (0, 0, 0, 0)
-    frame = log.copy()
-    ImageDraw.Draw(frame).rectangle((1, 1, 12, 12), fill=empty)
-    top = sheet.copy().transpose(Transpose.TRANSVERSE)
-    top.paste(frame, (0, 0), frame)
-
-    side = top.copy()
-    ImageDraw.Draw(side).rectangle((0, 0, 14, 3), fill=empty)
-    log_section = log.copy()
-    ImageDraw.Draw(log_section).rectangle((0, 1, 14, 14), fill=empty)
-    side.paste(log_section, (0, 4), log_section)
-    side.paste(log_section, (0, 13), log_section)
-
-    rim = top.copy()
-    ImageDraw.Draw(rim).rectangle((0, 0, 14, 9), fill=empty)
-    rim.paste(log_section, (0, 9), log_section)
-    underside = top.copy()
-    ImageDraw.Draw(underside).rectangle((2, 2, 11, 11), fill=(0, 0, 0, 255))
-
-    cover = top.copy()
-    shaded_square = Image.new('RGBA', (10, 10), (0, 0, 0, 180))
-    blank = Image.new('RGBA', (14, 14), empty)
-    blank.paste(shaded_square, (2, 2), shaded_square)
-    cover = Image.alpha_composite(cover, blank)
-
-    handle = Image.open(templates + 'chest/handle.png').convert('RGBA')
-    normal = Image.new('RGBA', (64, 64), empty)
-    normal.paste(handle, (0, 0), handle)
-    normal.paste(cover, (14, 0), cover)
-    normal.paste(top, (28, 0), top)
-    for i in range(0, 4):
-        normal.paste(rim, (i * 14, 5), rim)
-        normal.paste(side, (i * 14, 29), side)
-    normal.paste(top, (14, 19), top)
-    normal.paste(underside, (28, 19), underside)
-    normal.save(path + 'entity/chest/normal/%s' % wood + '.png')
-    trapped = normal.copy()
-    trapped_overlay = Image.open(templates + 'chest/trapped_overlay.png')
-    trapped = Image.alpha_composite(trapped, trapped_overlay)
-    trapped.save(path + 'entity/chest/trapped/%s' % wood + '.png')
-
-    # Double Chests
-    log_rect = Image.open(path + 'block/wood/log/%s' % wood + '.png').convert('RGBA').crop((0, 0, 15, 14))
-    sheet_rect = Image.open(path + 'block/wood/sheet/%s' % wood + '.png').convert('RGBA').crop((0, 0, 15, 14))
-
-    top_right = sheet_rect.copy()
-    top_right_frame = log_rect.copy()
-    ImageDraw.Draw(top_right_frame).rectangle((0, 1, 13, 12), fill=empty)
-    top_right.paste(top_right_frame, (0, 0), top_right_frame)
-
-    top_left = sheet_rect.copy()
-    top_left_frame = log_rect.copy()
-    ImageDraw.Draw(top_left_frame).rectangle((1, 1, 15, 12), fill=empty)
-    top_left.paste(top_left_frame, (0, 0), top_left_frame)
-
-    underside_right = top_right.copy()
-    ImageDraw.Draw(underside_right).rectangle((0, 2, 12, 11), fill=(0, 0, 0, 255))
-    underside_left = top_left.copy()
-    ImageDraw.Draw(underside_left).rectangle((2, 2, 15, 11), fill=(0, 0, 0, 255))
-
-    cover_right = top_right.copy()
-    shaded_rectangle = Image.new('RGBA', (13, 10), (0, 0, 0, 180))
-    blank = Image.new('RGBA', (15, 14), empty)
-    blank.paste(shaded_rectangle, (0, 2), shaded_rectangle)
-    cover_right = Image.alpha_composite(cover_right, blank)
-    cover_left = top_left.copy()
-    blank = Image.new('RGBA', (15, 14), empty)
-    blank.paste(shaded_rectangle, (2, 2), shaded_rectangle)
-    cover_left = Image.alpha_composite(cover_left, blank)
-
-    rim_right = top_right.copy()
-    ImageDraw.Draw(rim_right).rectangle((0, 0, 15, 9), fill=empty)
-    rim_right.paste(log_section, (0, 9), log_section)
-    rim_right.paste(log_section, (1, 9), log_section)
-    rim_left = top_left.copy()
-    ImageDraw.Draw(rim_left).rectangle((0, 0, 15, 9), fill=empty)
-    rim_left.paste(log_section, (0, 9), log_section)
-    rim_left.paste(log_section, (1, 9), log_section)
-
-    side_right = top_right.copy()
-    ImageDraw.Draw(side_right).rectangle((0, 0, 15, 3), fill=empty)
-    log_section = log.copy()
-    ImageDraw.Draw(log_section).rectangle((0, 1, 15, 14), fill=empty)
-    side_right.paste(log_section, (0, 4), log_section)
-    side_right.paste(log_section, (1, 4), log_section)
-    side_right.paste(log_section, (0, 13), log_section)
-    side_right.paste(log_section, (1, 13), log_section)
-    side_left = top_left.copy()
-    ImageDraw.Draw(side_left).rectangle((0, 0, 15, 3), fill=empty)
-    log_section = log.copy()
-    ImageDraw.Draw(log_section).rectangle((0, 1, 15, 14), fill=empty)
-    side_left.paste(log_section, (0, 4), log_section)
-    side_left.paste(log_section, (1, 4), log_section)
-    side_left.paste(log_section, (0, 13), log_section)
-    side_left.paste(log_section, (1, 13), log_section)
-
-    normal_left = Image.new('RGBA', (64, 64), empty)
-    handle = Image.open(templates + 'chest/handle_left.png')
-    normal_left.paste(handle, (0, 0), handle)
-    normal_left.paste(cover_right, (14, 0), cover_right)
-    normal_left.paste(top_right, (29, 0), top_right)
-    normal_left.paste(rim_right, (14, 5), rim_right)
-    normal_left.paste(rim, (29, 5), rim)
-    normal_left.paste(rim_left, (43, 5), rim_left)
-    normal_left.paste(top_right, (14, 19), top_right)
-    normal_left.paste(underside_right, (29, 19), underside_right)
-    normal_left.paste(side, (29, 29), side)
-    normal_left.paste(side_right, (14, 29), side_right)
-    normal_left.paste(side_left, (43, 29), side_left)
-    normal_left.save(path + 'entity/chest/normal_left/%s' % wood + '.png')
-    left_trapped_overlay = Image.open(templates + 'chest/trapped_left_overlay.png')
-    left_trapped = Image.alpha_composite(normal_left, left_trapped_overlay)
-    left_trapped.save(path + 'entity/chest/trapped_left/%s' % wood + '.png')
-
-    normal_right = Image.new('RGBA', (64, 64), empty)
-    handle = Image.open(templates + 'chest/handle_right.png')
-    normal_right.paste(handle, (0, 0), handle)
-    normal_right.paste(cover_left, (14, 0), cover_left)
-    normal_right.paste(top_left, (29, 0), top_left)
-    normal_right.paste(rim, (0, 5), rim)
-    normal_right.paste(rim_left, (14, 5), rim_left)
-    normal_right.paste(rim_right, (43, 5), rim_right)
-    normal_right.paste(top_left, (14, 19), top_left)
-    normal_right.paste(cover_left, (29, 19), cover_left)
-    normal_right.paste(underside_left, (29, 19), underside_left)
-    normal_right.paste(side, (0, 29), side)
-    normal_right.paste(side_left, (14, 29), side_right)
-    normal_right.paste(side_right, (43, 29), side_left)
-    normal_right.save(path + 'entity/chest/normal_right/%s' % wood + '.png')
-    right_trapped_overlay = Image.open(templates + 'chest/trapped_right_overlay.png')
-    right_trapped = Image.alpha_composite(normal_right, right_trapped_overlay)
-    right_trapped.save(path + 'entity/chest/trapped_right/%s' % wood + '.png')
+    compositing.render('chest', CHEST, {
+        'normal': path + 'entity/chest/normal/{wood}.png',
+        'trapped': path + 'entity/chest/trapped/{wood}.png',
+        'normal_left': path + 'entity/chest/normal_left/{wood}.png',
+        'trapped_left': path + 'entity/chest/trapped_left/{wood}.png',
+        'normal_right': path + 'entity/chest/normal_right/{wood}.png',
+        'trapped_right': path + 'entity/chest/trapped_right/{wood}.png',
+    }, open_image, save_image, wood=wood)
 
 def create_sign(wood: str):
-    log = Image.open(path + 'block/wood/log/%s' % wood + '.png').convert('RGBA')
-    planks = Image.open(path + 'block/wood/planks/%s' % wood + '.png').convert('RGBA')
-    image = Image.new('RGBA', (64, 32), (0, 0, 0, 0))
-    for coord in ((0, 0), (16, 0), (32, 0), (48, 0)):
-        image.paste(planks, coord)
-    image.paste(log, (0, 16))
-    image.save(path + 'entity/signs/%s.png' % wood)
+    compositing.render('sign', SIGN, {'sign': path + 'entity/signs/{wood}.png'}, open_image, save_image, wood=wood)
 
 def create_sign_item(wood: str, plank_color, log_color):
-    head = Image.open(templates + 'sign_head.png')
-    mast = Image.open(templates + 'sign_mast.png')
-    head = put_on_all_pixels(head, plank_color)
-    mast = put_on_all_pixels(mast, log_color)
-    image = Image.alpha_composite(mast, head)
-    image.save(path + 'item/wood/sign/%s.png' % wood)
+    compositing.render('sign', SIGN, {'sign_item': path + 'item/wood/sign/{wood}.png'}, open_image, save_image, wood=wood, plank_color=plank_color, log_color=log_color)
 
 def create_magma(rock: str):
     magma = Image.new('RGBA', (16, 48), (0, 0, 0, 0))
-    raw = Image.open(templates + '/raw/%s.png' % rock)
+    raw = open_image(templates + '/raw/%s.png' % rock)
     magma.paste(raw, (0, 0))
     magma.paste(raw, (0, 16))
     magma.paste(raw, (0, 32))
-    overlay = Image.open(templates + 'magma.png')
+    overlay = open_image(templates + 'magma.png')
     magma = Image.alpha_composite(magma, overlay)
-    magma.save(path + 'block/rock/magma/%s.png' % rock)
+    save_image(magma, path + 'block/rock/magma/%s.png' % rock)
 
 def create_chest_minecart(wood: str, plank_color):
-    top = Image.open(templates + 'chest_minecart_chest.png')
-    bottom = Image.open(templates + 'chest_minecart_cart.png')
+    top = open_image(templates + 'chest_minecart_chest.png')
+    bottom = open_image(templates + 'chest_minecart_cart.png')
     top = put_on_all_pixels(top, plank_color)
     image = Image.alpha_composite(bottom, top)
-    image.save(path + 'item/wood/chest_minecart/%s.png' % wood)
+    save_image(image, path + 'item/wood/chest_minecart/%s.png' % wood)
 
 def create_horse_chest(wood: str, plank_color, log_color):
-    for variant in ('chest', 'barrel'):
-        image = Image.new('RGBA', (64, 64), (0, 0, 0, 0))
-        overlay = Image.open(templates + 'horse_%s_overlay.png' % variant).convert('RGBA')
-        frame = Image.open(templates + 'horse_%s_log.png' % variant).convert('RGBA')
-        body = Image.open(templates + 'horse_%s_sheet.png' % variant).convert('RGBA')
-        frame = put_on_all_pixels(frame, log_color)
-        body = put_on_all_pixels(body, plank_color)
-        image.paste(frame, (26, 21), frame)
-        image.paste(body, (26, 21), body)
-        image.paste(overlay, (26, 21), overlay)
-        if variant == 'chest':
-            image.save(path + 'entity/chest/horse/%s.png' % wood)
-        elif variant == 'barrel':
-            image.save(path + 'entity/chest/horse/%s_barrel.png' % wood)
+    compositing.render('horse_chest', HORSE_CHEST, {
+        'chest': path + 'entity/chest/horse/{wood}.png',
+        'barrel': path + 'entity/chest/horse/{wood}_barrel.png',
+    }, open_image, save_image, wood=wood, plank_color=plank_color, log_color=log_color)
 
 
 def create_logs(wood: str, plank_color):
-    log = Image.open(templates + 'log.png')
-    face = Image.open(templates + 'log_face.png')
-    log_dark = Image.open(templates + 'log_dark_face.png')
-    actual_log = Image.open(path + 'item/wood/log/%s.png' % wood).convert('RGBA')
+    log = open_image(templates + 'log.png')
+    face = open_image(templates + 'log_face.png')
+    log_dark = open_image(templates + 'log_dark_face.png')
+    actual_log = open_image(path + 'item/wood/log/%s.png' % wood).convert('RGBA')
     wood_item = Image.alpha_composite(actual_log, put_on_all_pixels(face, actual_log.getpixel((4, 4)), dark_threshold=25))
-    wood_item.save(path + 'item/wood/wood/%s.png' % wood)
+    save_image(wood_item, path + 'item/wood/wood/%s.png' % wood)
 
     stripped_log_item = put_on_all_pixels(log, plank_color)
-    stripped_log_item.save(path + 'item/wood/stripped_log/%s.png' % wood)
+    save_image(stripped_log_item, path + 'item/wood/stripped_log/%s.png' % wood)
     stripped_wood_item = put_on_all_pixels(log_dark, plank_color)
-    stripped_wood_item.save(path + 'item/wood/stripped_wood/%s.png' % wood)
+    save_image(stripped_wood_item, path + 'item/wood/stripped_wood/%s.png' % wood)
 
 
 def get_wood_colors(wood_path: str):
-    wood = Image.open(path + 'block/wood/%s.png' % wood_path)
+    wood = open_image(path + 'block/wood/%s.png' % wood_path)
     return wood.getpixel((0, 0))
 
-def easy_colorize(color, from_path, to_path, saturation: float = 1, dark_threshold: int = 50):
-    img = Image.open(from_path + '.png')
-    new_image = put_on_all_pixels(img, color, dark_threshold)
-    if saturation != 1:
-        new_image = ImageEnhance.Color(new_image).enhance(saturation)
-    new_image.save(to_path + '.png')
+def easy_colorize_all(colors: Mapping[str, Any], from_path, saturation: float = 1, dark_threshold: int = 50):
+    """ Colorizes a single template with many colors, where colors is a map of output path -> color """
+    img = open_image(from_path + '.png')
+    for to_path, new_image in zip(colors.keys(), put_on_all_pixels_batch(img, list(colors.values()), dark_threshold)):
+        if saturation != 1:
+            new_image = ImageEnhance.Color(new_image).enhance(saturation)
+        save_image(new_image, to_path + '.png')
 
 def put_on_all_pixels(img: Image, color, dark_threshold: int = 50) -> Image:
-    if isinstance(color, int):
-        color = (color, color, color, 255)
+    return put_on_all_pixels_batch(img, [color], dark_threshold)[0]
+
+def put_on_all_pixels_batch(img: Image, colors: Sequence, dark_threshold: int = 50) -> List[Image]:
+    """ Replaces the hue and saturation of every pixel with that of each color, keeping the value (halved, for dark colors) and alpha. Returns an image for each color """
     img = img.convert('RGBA')
     _, _, _, alpha = img.split()
-    img = img.convert('HSV')
-    hue, sat, val = colorsys.rgb_to_hsv(color[0], color[1], color[2])
-    for x in range(0, img.width):
-        for y in range(0, img.height):
-            dat = img.getpixel((x, y))
-            tup = (int(hue * 255), int(sat * 255), int(dat[2] if val > dark_threshold else dat[2] * 0.5))
-            img.putpixel((x, y), tup)
-    img = img.convert('RGBA')
-    img.putalpha(alpha)
-    return img
-
-def main():
-    for wood in WOODS.keys():
-        overlay_image(templates + 'log_top/%s' % wood, path + 'block/wood/log/%s' % wood, path + 'block/wood/log_top/%s' % wood)
-        overlay_image(templates + 'log_top/%s' % wood, path + 'block/wood/stripped_log/%s' % wood, path + 'block/wood/stripped_log_top/%s' % wood)
-        for bench in ('workbench_front', 'workbench_side', 'workbench_top'):
-            overlay_image(templates + bench, path + 'block/wood/planks/%s' % wood, path + 'block/wood/planks/%s_' % wood + bench)
-        create_chest(wood)
-        create_sign(wood)
-        plank_color = get_wood_colors('planks/%s' % wood)
-        log_color = get_wood_colors('log/%s' % wood)
-        create_sign_item(wood, plank_color, log_color)
-        for item in ('twig', 'boat', 'lumber'):
-            easy_colorize(plank_color, templates + '/%s' % item, path + 'item/wood/%s/%s' % (item, wood))
-        easy_colorize(plank_color, templates + '/bookshelf_side', path + 'block/wood/planks/%s_bookshelf_side' % wood)
-        easy_colorize(plank_color, templates + '/bookshelf_top', path + 'block/wood/planks/%s_bookshelf_top' % wood)
-        for i in range(0, 7):
-            overlay_image(templates + '/bookshelf_' + str(i), path + 'block/wood/planks/%s_bookshelf_side' % wood, path + 'block/wood/planks/%s_bookshelf_stage%s' % (wood, str(i)))
-        create_chest_minecart(wood, plank_color)
-        create_logs(wood, plank_color)
-        create_horse_chest(wood, plank_color, log_color)
-
-    for rock, data in ROCKS.items():
-        overlay_image(templates + 'mossy_stone_bricks', path + 'block/rock/bricks/%s' % rock, path + 'block/rock/mossy_bricks/%s' % rock)
-        overlay_image(templates + 'mossy_cobblestone', path + 'block/rock/cobble/%s' % rock, path + 'block/rock/mossy_cobble/%s' % rock)
-        if data.category == 'igneous_intrusive' or data.category == 'igneous_extrusive':
-            create_magma(rock)
-
-    for soil in SOIL_BLOCK_VARIANTS:
-        overlay_image(templates + 'rooted_dirt', templates + 'dirt/%s' % soil, path + 'block/rooted_dirt/%s' % soil)
-
+    val = numpy.asarray(img.convert('HSV'))[:, :, 2]
+    images = []
+    for color in colors:
+        if isinstance(color, int):
+            color = (color, color, color, 255)
+        hue, sat, color_val = colorsys.rgb_to_hsv(color[0], color[1], color[2])
+        hsv = numpy.empty(val.shape + (3,), dtype=numpy.uint8)
+        hsv[:, :, 0] = int(hue * 255)
+        hsv[:, :, 1] = int(sat * 255)
+        hsv[:, :, 2] = val if color_val > dark_threshold else val // 2
+        new_image = Image.fromarray(hsv, 'HSV').convert('RGBA')
+        new_image.putalpha(alpha)
+        new_image.info.update(img.info)  # Keep metadata, such as the color profile, as converting the original image would
+        images.append(new_image)
+    return images
+
+def main(jobs: int = 1, incremental: bool = False, optimize: bool = False, profile: bool = False) -> List[str]:
+    """
+    Generates all textures. Textures for each wood, rock and soil are independent, so with jobs > 1 they are generated in parallel.
+    :param incremental: If true, build steps whose inputs and outputs are unchanged since the last run are skipped.
+    :param optimize: If true, all generated textures are losslessly optimized afterwards.
+    :param profile: If true, prints the time spent on each layer of composited textures.
+    :return: The path of every generated texture.
+    """
+    global manifest
+    manifest = Manifest() if incremental else None
+    plank_colors = {wood: get_wood_colors('planks/%s' % wood) for wood in WOODS.keys()}
+    total, steps, files, timings = run_task(create_colorized, plank_colors)  # Other textures are built on top of these, so they are created first
+
+    tasks = [
+        *[(create_wood, wood, plank_colors[wood]) for wood in WOODS.keys()],
+        *[(create_rock, rock, data.category) for rock, data in ROCKS.items()],
+        *[(create_rooted_dirt, soil) for soil in SOIL_BLOCK_VARIANTS],
+        (create_compasses,),
+    ]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=set_manifest, initargs=(manifest,)) as pool:
+            results = [pool.submit(run_task, *task) for task in tasks]
+            results = [result.result() for result in results]
+    else:
+        results = [run_task(*task) for task in tasks]
+    for task_counts, task_steps, task_files, task_timings in results:
+        total += task_counts
+        steps.update(task_steps)
+        files += task_files
+        timings += task_timings
+    print('Written = %d, Unchanged = %d, Skipped = %d' % (total['written'], total['unchanged'], total['skipped']))
+
+    if optimize:
+        optimize_png.optimize_all(files, jobs)
+    if manifest is not None:
+        if optimize:
+            for entry in steps.values():  # Optimizing modifies outputs, which may be inputs of other steps, without changing their pixels
+                entry['inputs'] = {file: file_digest(file) for file in entry['inputs']}
+                entry['outputs'] = {file: file_digest(file) for file in entry['outputs']}
+        manifest.save(steps)
+    if profile:
+        compositing.report(timings)
+    return files
+
+
+def set_manifest(value: Optional[Manifest]):
+    global manifest
+    manifest = value
+
+
+def run_task(task: Callable, *args) -> Tuple[Counter, Dict[str, Any], List[str], Counter]:
+    """ Runs a single task, and returns the number of images it wrote, left unchanged, and skipped, the build steps it ran, the path of every image, and the time spent on each composited layer """
+    counts.clear()
+    outputs.clear()
+    compositing.timings.clear()
+    if manifest is not None:
+        manifest.updates = {}
+    task(*args)
+    return Counter(counts), manifest.updates if manifest is not None else {}, list(outputs), Counter(compositing.timings)
+
+
+def create_colorized(plank_colors: Dict[str, Any]):
+    for item in ('twig', 'boat', 'lumber'):
+        build(easy_colorize_all, {path + 'item/wood/%s/%s' % (item, wood): color for wood, color in plank_colors.items()}, templates + '/%s' % item)
+    build(easy_colorize_all, {path + 'block/wood/planks/%s_bookshelf_side' % wood: color for wood, color in plank_colors.items()}, templates + '/bookshelf_side')
+    build(easy_colorize_all, {path + 'block/wood/planks/%s_bookshelf_top' % wood: color for wood, color in plank_colors.items()}, templates + '/bookshelf_top')
+
+
+def create_wood(wood: str, plank_color):
+    build(overlay_image, templates + 'log_top/%s' % wood, path + 'block/wood/log/%s' % wood, path + 'block/wood/log_top/%s' % wood)
+    build(overlay_image, templates + 'log_top/%s' % wood, path + 'block/wood/stripped_log/%s' % wood, path + 'block/wood/stripped_log_top/%s' % wood)
+    for bench in ('workbench_front', 'workbench_side', 'workbench_top'):
+        build(overlay_image, templates + bench, path + 'block/wood/planks/%s' % wood, path + 'block/wood/planks/%s_' % wood + bench)
+    build(create_chest, wood)
+    build(create_sign, wood)
+    log_color = get_wood_colors('log/%s' % wood)
+    build(create_sign_item, wood, plank_color, log_color)
+    for i in range(0, 7):
+        build(overlay_image, templates + '/bookshelf_' + str(i), path + 'block/wood/planks/%s_bookshelf_side' % wood, path + 'block/wood/planks/%s_bookshelf_stage%s' % (wood, str(i)))
+    build(create_chest_minecart, wood, plank_color)
+    build(create_logs, wood, plank_color)
+    build(create_horse_chest, wood, plank_color, log_color)
+
+
+def create_rock(rock: str, category: str):
+    build(overlay_image, templates + 'mossy_stone_bricks', path + 'block/rock/bricks/%s' % rock, path + 'block/rock/mossy_bricks/%s' % rock)
+    build(overlay_image, templates + 'mossy_cobblestone', path + 'block/rock/cobble/%s' % rock, path + 'block/rock/mossy_cobble/%s' % rock)
+    if category == 'igneous_intrusive' or category == 'igneous_extrusive':
+        build(create_magma, rock)
+
+
+def create_rooted_dirt(soil: str):
+    build(overlay_image, templates + 'rooted_dirt', templates + 'dirt/%s' % soil, path + 'block/rooted_dirt/%s' % soil)
+
+
+def create_compasses():
     for i in range(0, 32):
         number = str(i) if i > 9 else '0' + str(i)
-        overlay_image(templates + 'compass_overlay', templates + 'compass/compass_%s' % number, mc_path + 'item/compass_%s' % number)
+        build(overlay_image, templates + 'compass_overlay', templates + 'compass/compass_%s' % number, mc_path + 'item/compass_%s' % number)
 
 
 if __name__ == '__main__':
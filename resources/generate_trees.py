@@ -1,15 +1,28 @@
+import functools
+import hashlib
+import io
+import json
 import os
-from typing import Set, Any, Tuple, NamedTuple, Literal, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Tuple, NamedTuple, Literal, Union, Dict, List, Sequence
 
+import numpy
 from nbtlib import nbt
-from nbtlib.tag import String as StringTag, Int as IntTag
+
+import constants
+import structure_remap
+from structure_remap import Substitution
 
 Tree = NamedTuple('Tree', name=str, feature=Literal['random', 'overlay', 'stacked'], variant=str, count=Union[int, Tuple[int, ...]])
 
 DATA_VERSION = 2975
 
+LOGS = ('minecraft:oak_log', 'minecraft:oak_wood')
+LEAVES = ('minecraft:oak_leaves',)
+
 TEMPLATES_DIR = './resources/structure_templates'
 STRUCTURES_DIR = './src/main/resources/data/tfc/structures'
+MANIFEST_PATH = './.cache/tree_manifest.json'
 
 NORMAL_TREES = [
     Tree('acacia', 'random', 'acacia', 35),
@@ -72,6 +85,34 @@ DEAD_TREES = [
 ]
 
 
+class Voxels(NamedTuple):
+    states: numpy.ndarray  # The palette index of each block, indexed by [x, y, z], or -1 where the template has no block
+    palette: Tuple[str, ...]  # The name of each block in the palette
+
+    @property
+    def present(self) -> numpy.ndarray:
+        return self.states >= 0
+
+    def mask(self, *names: str) -> numpy.ndarray:
+        """ True where the template has a block with any of the given names """
+        return numpy.isin(self.states, [i for i, name in enumerate(self.palette) if name in names])
+
+    def resized(self, shape: Tuple[int, int, int]) -> 'Voxels':
+        """ Extends the template to a larger size, with no blocks """
+        states = numpy.full(shape, -1, dtype=numpy.int32)
+        sx, sy, sz = self.states.shape
+        states[:sx, :sy, :sz] = self.states
+        return Voxels(states, self.palette)
+
+
+class TreeStats(NamedTuple):
+    name: str
+    leaves: float  # Expected counts, over all variants of the tree
+    logs: float
+    canopy: Tuple[int, int, int]  # The size of the largest bounding box of leaves, over all variants of the tree
+    chance: float  # The computed chance for each leaf to drop a sapling, which is printed to be copied into TREE_SAPLING_DROP_CHANCES
+
+
 class Count:  # global mutable variables that doesn't require using the word "global" :)
     SKIPPED = 0
     NEW = 0
@@ -79,7 +120,20 @@ class Count:  # global mutable variables that doesn't require using the word "gl
     ERRORS = 0
 
 
-def main():
+manifest: Dict[str, Dict[str, str]] = {}  # For each structure, the digests of its uncompressed payload and of its file, as of the last run
+updates: Dict[str, Dict[str, str]] = {}  # Manifest entries of the structures made by the current process
+
+
+def main(jobs: int = 1):
+    """
+    Verifies and analyzes tree templates, and makes tree structures for every wood.
+    :param jobs: The number of processes used to make tree structures. Structures for trees which share templates are independent of other trees, so with jobs > 1 they are made in parallel.
+    """
+    global manifest
+    load_template.cache_clear()  # Templates are decoded at most once per run
+    load_voxels.cache_clear()
+    manifest = load_manifest()
+
     print('Verifying tree structures')
     verify_center_trunk('acacia', 35)
     verify_center_trunk('aspen', 16)
@@ -94,121 +148,209 @@ def main():
     verify_center_trunk('dead_small', 6)
     verify_center_trunk('dead_tall', 6)
 
+    stats = [analyze_tree(tree) for tree in NORMAL_TREES]
     print('Tree sapling drop chances:')
-    for tree in NORMAL_TREES:
-        analyze_tree_leaves(tree)
+    for tree in stats:
+        print('%s: %.4f,' % (repr(tree.name), tree.chance))
+
+    print('Tree analysis, with expected saplings per tree from the configured TREE_SAPLING_DROP_CHANCES:')
+    print('%-12s %8s %8s %9s %12s %9s %9s' % ('Tree', 'Leaves', 'Logs', 'Log/Leaf', 'Canopy', 'Chance', 'Saplings'))
+    outdated = []
+    for tree in stats:
+        configured = constants.TREE_SAPLING_DROP_CHANCES[tree.name]
+        if round(tree.chance, 4) != configured:
+            outdated.append(tree.name)
+        print('%-12s %8.1f %8.1f %9.3f %12s %9.4f %9.2f%s' % (tree.name, tree.leaves, tree.logs, tree.logs / tree.leaves, '%dx%dx%d' % tree.canopy, configured, tree.leaves * configured, ' *' if tree.name in outdated else ''))
+    if outdated:
+        print('* The configured chance differs from the computed chance, TREE_SAPLING_DROP_CHANCES should be updated for: %s' % ', '.join(outdated))
 
     print('Making tree structures')
-    for tree in NORMAL_TREES:
-        make_tree_structures(tree)
-
-    for tree in LARGE_TREES:
-        make_tree_structures(tree, '_large')
+    groups: Dict[Tuple[Any, ...], List[Tree]] = {}  # Trees which share the same templates
+    for trees, suffix in ((NORMAL_TREES, ''), (LARGE_TREES, '_large'), (DEAD_TREES, '_dead')):
+        for tree in trees:
+            groups.setdefault((tree.feature, tree.variant, tree.count, suffix), []).append(tree)
+    tasks = [(trees, key[-1]) for key, trees in groups.items()]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=set_manifest, initargs=(manifest,)) as pool:
+            results = [pool.submit(run_task, *task) for task in tasks]
+            results = [result.result() for result in results]
+    else:
+        results = [run_task(*task) for task in tasks]
 
-    for tree in DEAD_TREES:
-        make_tree_structures(tree, '_dead')
+    totals = (0, 0, 0, 0)
+    entries = {}
+    for counts, task_updates in results:
+        totals = tuple(total + count for total, count in zip(totals, counts))
+        entries.update(task_updates)
+    Count.NEW, Count.MODIFIED, Count.SKIPPED, Count.ERRORS = totals
+    save_manifest(entries)
 
     print('New = %d, Modified = %d, Unchanged = %d, Errors = %d' % (Count.NEW, Count.MODIFIED, Count.SKIPPED, Count.ERRORS))
 
 
-def make_tree_structures(tree: Tree, suffix: str = ''):
-    result = tree.name + suffix
+def set_manifest(value: Dict[str, Dict[str, str]]):
+    global manifest
+    manifest = value
+
+
+def run_task(trees: Sequence[Tree], suffix: str) -> Tuple[Tuple[int, int, int, int], Dict[str, Dict[str, str]]]:
+    """ Makes the structures for trees which share the same templates, and returns the number of new, modified, unchanged and failed structures, and their manifest entries """
+    Count.NEW = Count.MODIFIED = Count.SKIPPED = Count.ERRORS = 0
+    updates.clear()
+    make_tree_structures(trees, suffix)
+    return (Count.NEW, Count.MODIFIED, Count.SKIPPED, Count.ERRORS), dict(updates)
+
+
+def make_tree_structures(trees: Sequence[Tree], suffix: str = ''):
+    """ Makes the structures for trees which share the same templates. Each template is loaded once, and remapped for every wood """
+    for template, dest in tree_templates(trees[0]):
+        source = load_template(template)
+        for name in structure_remap.unmapped_blocks(source, wood_blocks('oak')):
+            print('Structure: %s has an invalid block state \'%s\'' % (template, name))
+
+        # Hack the data version, to avoid needing to run DFU on anything
+        for wood, f in structure_remap.remap_all(source, {tree.name: wood_blocks(tree.name) for tree in trees}, DATA_VERSION).items():
+            save_tree_structure(f, dest, wood + suffix)
+
+
+def tree_templates(tree: Tree) -> List[Tuple[str, str]]:
+    """ The template, and the destination structure name, of every structure of a tree """
     if tree.feature == 'random':
-        for i in range(1, 1 + tree.count):
-            make_tree_structure(tree.variant + str(i), tree.name, str(i), result)
+        return [(tree.variant + str(i), str(i)) for i in range(1, 1 + tree.count)]
     elif tree.feature == 'overlay':
-        make_tree_structure(tree.variant, tree.name, 'base', result)
-        make_tree_structure(tree.variant + '_overlay', tree.name, 'overlay', result)
+        return [(tree.variant, 'base'), (tree.variant + '_overlay', 'overlay')]
     elif tree.feature == 'stacked':
-        for j, c in zip(range(1, 1 + len(tree.count)), tree.count):
-            for i in range(1, 1 + c):
-                make_tree_structure('%s_layer%d_%d' % (tree.variant, j, i), tree.name, 'layer%d_%d' % (j, i), result)
-
-
-def make_tree_structure(template: str, wood: str, dest: str, wood_dir: str):
-    f = nbt.load('%s/%s.nbt' % (TEMPLATES_DIR, template))
-    for block in f['palette']:
-        if block['Name'] == 'minecraft:oak_log':
-            block['Name'] = StringTag('tfc:wood/log/%s' % wood)
-            block['Properties']['natural'] = StringTag('true')
-        elif block['Name'] == 'minecraft:oak_wood':
-            block['Name'] = StringTag('tfc:wood/wood/%s' % wood)
-            block['Properties']['natural'] = StringTag('true')
-        elif block['Name'] == 'minecraft:oak_leaves':
-            block['Name'] = StringTag('tfc:wood/leaves/%s' % wood)
-            block['Properties']['persistent'] = StringTag('false')
-        else:
-            print('Structure: %s has an invalid block state \'%s\'' % (template, block['Name']))
+        return [('%s_layer%d_%d' % (tree.variant, j, i), 'layer%d_%d' % (j, i)) for j, c in zip(range(1, 1 + len(tree.count)), tree.count) for i in range(1, 1 + c)]
+    raise NotImplementedError
+
+
+def wood_blocks(wood: str) -> structure_remap.SubstitutionTable:
+    return {
+        'minecraft:oak_log': Substitution('tfc:wood/log/%s' % wood, {'natural': 'true'}),
+        'minecraft:oak_wood': Substitution('tfc:wood/wood/%s' % wood, {'natural': 'true'}),
+        'minecraft:oak_leaves': Substitution('tfc:wood/leaves/%s' % wood, {'persistent': 'false'}),
+    }
 
-    # Hack the data version, to avoid needing to run DFU on anything
-    f['DataVersion'] = IntTag(DATA_VERSION)
 
+def save_tree_structure(f: nbt.File, dest: str, wood_dir: str):
     result_dir = '%s/%s/' % (STRUCTURES_DIR, wood_dir)
     os.makedirs(result_dir, exist_ok=True)
 
     file_name = result_dir + dest + '.nbt'
+    payload = payload_digest(f)
     try:
         if os.path.isfile(file_name):
-            # Load and diff the original file - do not overwrite if source identical to avoid unnecessary git diffs due to gzip inconsistencies.
-            original = nbt.load(file_name)
-            if original == f:
+            # Do not overwrite if source identical to avoid unnecessary git diffs due to gzip inconsistencies.
+            # If the file is unchanged since the last run, compare payload digests, otherwise load and diff the original file
+            digest = file_digest(file_name)
+            entry = manifest.get(file_name)
+            if (entry is not None and entry == {'payload': payload, 'file': digest}) or nbt.load(file_name) == f:
                 Count.SKIPPED += 1
+                updates[file_name] = {'payload': payload, 'file': digest}
                 return
             else:
                 Count.MODIFIED += 1
         else:
             Count.NEW += 1
-        f.save(result_dir + dest + '.nbt')
+        f.save(file_name)
+        updates[file_name] = {'payload': payload, 'file': file_digest(file_name)}
     except:
         Count.ERRORS += 1
 
 
-def analyze_tree_leaves(tree: Tree):
-    if tree.feature == 'random':
-        leaves = count_leaves_in_random_tree(tree.variant, tree.count)
-    elif tree.feature == 'overlay':
-        leaves = count_leaves_in_overlay_tree(tree.variant)
-    else:
-        raise NotImplementedError
+def payload_digest(f: nbt.File) -> str:
+    """ The digest of the uncompressed payload of a structure, which unlike the gzip output, is identical for identical structures """
+    buffer = io.BytesIO()
+    f.write(buffer, f.byteorder)
+    return hashlib.sha256(buffer.getvalue()).hexdigest()
+
+
+def file_digest(file: str) -> str:
+    with open(file, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_manifest() -> Dict[str, Dict[str, str]]:
+    if os.path.isfile(MANIFEST_PATH):
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(entries: Dict[str, Dict[str, str]]):
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(entries))
+
+
+def analyze_tree(tree: Tree) -> TreeStats:
+    variants = tree_variants(tree)
+    leaves = count_leaves(tree)
+    logs = sum(int(v_logs.sum()) for v_logs, _ in variants) / len(variants)
+    canopy = tuple(int(size) for size in numpy.max([bounding_box(v_leaves) for _, v_leaves in variants], axis=0))
 
     # Base value: every tree results in 3.5 saplings, on average, if every leaf was broken
     # We bias this towards returning larger values, for larger trees, as it requires more leaves to break
     chance = 3.5 / leaves
     if chance < 0.02:
         chance = 0.2 * 0.02 + 0.8 * chance
-    print('%s: %.4f,' % (repr(tree.name), chance))
+    return TreeStats(tree.name, leaves, logs, canopy, chance)
 
 
-def count_leaves_in_random_tree(base_name: str, count: int) -> float:
-    counts = [count_leaves_in_structure(base_name + str(i)) for i in range(1, 1 + count)]
-    return sum(counts) / len(counts)
+def count_leaves(tree: Tree) -> float:
+    if tree.feature == 'random':
+        return sum(int(load_voxels(tree.variant + str(i)).mask(*LEAVES).sum()) for i in range(1, 1 + tree.count)) / tree.count
+    elif tree.feature == 'overlay':
+        # Each overlay block counts for half, as a new leaf if it is a leaf, or as removing a leaf if it is placed over one
+        base, overlay = overlaid_voxels(tree)
+        leaves, overlay_leaves = base.mask(*LEAVES), overlay.mask(*LEAVES)
+        return int(leaves.sum()) + 0.5 * int((overlay_leaves & ~leaves).sum()) - 0.5 * int((overlay.present & leaves).sum())
+    else:
+        raise NotImplementedError
 
 
-def count_leaves_in_overlay_tree(base_name: str) -> float:
-    base = nbt.load('%s/%s.nbt' % (TEMPLATES_DIR, base_name))
-    overlay = nbt.load('%s/%s_overlay.nbt' % (TEMPLATES_DIR, base_name))
+def tree_variants(tree: Tree) -> List[Tuple[numpy.ndarray, numpy.ndarray]]:
+    """ The log and leaf masks of each equally likely variant of a tree. Overlay trees are placed with the overlay half the time """
+    if tree.feature == 'random':
+        return [(voxels.mask(*LOGS), voxels.mask(*LEAVES)) for voxels in (load_voxels(tree.variant + str(i)) for i in range(1, 1 + tree.count))]
+    elif tree.feature == 'overlay':
+        base, overlay = overlaid_voxels(tree)
+        return [
+            (base.mask(*LOGS), base.mask(*LEAVES)),
+            (numpy.where(overlay.present, overlay.mask(*LOGS), base.mask(*LOGS)), numpy.where(overlay.present, overlay.mask(*LEAVES), base.mask(*LEAVES)))
+        ]
+    else:
+        raise NotImplementedError
+
 
-    base_leaves = leaf_ids(base)
-    leaves = set(pos_key(block) for block in base['blocks'] if block['state'] in base_leaves)
-    count = len(leaves)
+def overlaid_voxels(tree: Tree) -> Tuple[Voxels, Voxels]:
+    """ The base and overlay templates of an overlay tree, extended to the same size. Templates are compared by position, as the overlay may be larger than the base """
+    base, overlay = load_voxels(tree.variant), load_voxels(tree.variant + '_overlay')
+    shape = tuple(numpy.maximum(base.states.shape, overlay.states.shape))
+    return base.resized(shape), overlay.resized(shape)
 
-    for block in overlay['blocks']:
-        if block['state'] in base_leaves and pos_key(block) not in leaves:
-            count += 0.5
-        elif pos_key(block) in leaves:
-            count -= 0.5
 
-    return count
+def bounding_box(mask: numpy.ndarray) -> numpy.ndarray:
+    """ The size of the smallest box containing every position in a mask """
+    positions = numpy.argwhere(mask)
+    return positions.max(axis=0) - positions.min(axis=0) + 1 if len(positions) > 0 else numpy.zeros(3, dtype=int)
 
 
-def count_leaves_in_structure(file_name: str):
-    file = nbt.load('%s/%s.nbt' % (TEMPLATES_DIR, file_name))
-    leaves = leaf_ids(file)
-    return sum(block['state'] in leaves for block in file['blocks'])
+@functools.lru_cache(maxsize=None)
+def load_template(name: str) -> nbt.File:
+    """ Loads a structure template. The result is shared, and must not be modified """
+    return nbt.load('%s/%s.nbt' % (TEMPLATES_DIR, name))
 
 
-def leaf_ids(file: nbt.File) -> Set[int]:
-    return {i for i, block in enumerate(file['palette']) if block['Name'] == 'minecraft:oak_leaves'}
+@functools.lru_cache(maxsize=None)
+def load_voxels(name: str) -> Voxels:
+    """ Loads a structure template as a dense array of palette indices. The result is shared, and must not be modified """
+    template = load_template(name)
+    states = numpy.full(pos_key(template, 'size'), -1, dtype=numpy.int32)
+    if len(template['blocks']) > 0:
+        blocks = numpy.array([(*pos_key(block), int(block['state'])) for block in template['blocks']], dtype=numpy.int32)
+        states[blocks[:, 0], blocks[:, 1], blocks[:, 2]] = blocks[:, 3]
+    return Voxels(states, tuple(str(block['Name']) for block in template['palette']))
 
 
 def pos_key(tag: Any, key: str = 'pos') -> Tuple[int, int, int]:
@@ -218,27 +360,20 @@ def pos_key(tag: Any, key: str = 'pos') -> Tuple[int, int, int]:
 
 def verify_center_trunk(prefix: str, count: int):
     for i in range(1, 1 + count):
-        root = nbt.load('%s/%s%d.nbt' % (TEMPLATES_DIR, prefix, i))
-        sx, sy, sz = pos_key(root, 'size')
+        voxels = load_voxels('%s%d' % (prefix, i))
+        sx, sy, sz = voxels.states.shape
         if sx % 2 != 1 or sz % 2 != 1:
             print('Non-odd dimensions: %d x %d x %d on %s%d' % (sx, sy, sz, prefix, i))
             continue
 
-        center = sx // 2, 0, sz // 2
-        center_state = None
-        for block in root['blocks']:
-            if pos_key(block) == center:
-                center_state = int(block['state'])
-                break
-
-        if center_state is None:
+        center_state = voxels.states[sx // 2, 0, sz // 2]
+        if center_state < 0:
             print('Cannot find center trunk state on %s%d' % (prefix, i))
             continue
 
-        state = str(root['palette'][center_state]['Name'])
-        if state not in ('minecraft:oak_wood', 'minecraft:oak_log'):
-            print('Illegal center state, expected log, got: %s, on %s%d' % (state,prefix, i))
-
+        state = voxels.palette[center_state]
+        if state not in LOGS:
+            print('Illegal center state, expected log, got: %s, on %s%d' % (state, prefix, i))
 
 if __name__ == '__main__':
     main()
@@ -1,10 +1,12 @@
 from argparse import ArgumentParser
-from typing import NamedTuple, Tuple, List, TypeVar
+from typing import NamedTuple, Tuple, List
 
+import numpy
 from PIL import Image
 
+import optimize_png
+
 Point = NamedTuple('Point', x=int, y=int, r=int, g=int, b=int)
-Number = TypeVar('Number', int, float)
 
 
 def main():
@@ -12,6 +14,7 @@ def main():
     parser.add_argument('spec', type=str, default='', help='Fixed points, in the form x0,y0,c0;x1,y1,c1...')
     parser.add_argument('--size', type=str, default='256x256', help='The size of image to generate, in WxH format')
     parser.add_argument('--out', type=str, default='result.png', help='Output file')
+    parser.add_argument('--optimize', action='store_true', help='Losslessly optimize the output file')
 
     args = parser.parse_args()
     print('Running with', args)
@@ -33,10 +36,10 @@ def main():
         print(e)
         return
 
-    create(args.out, w, h, *points)
+    create(args.out, w, h, *points, optimize=args.optimize)
 
 
-def create(file: str, w: int, h: int, *points: Tuple[int, int, str]):
+def create(file: str, w: int, h: int, *points: Tuple[int, int, str], optimize: bool = False):
     def point(p: Tuple[int, int, str]):
         x, y, c = p
         if not (0 <= x < w and 0 <= y < h):
@@ -49,42 +52,47 @@ def create(file: str, w: int, h: int, *points: Tuple[int, int, str]):
         return Point(x, y, (c >> 16) & 0xFF, (c >> 8) & 0xFF, c & 0xFF)
 
     points = [point(p) for p in points]
-
-    image = Image.new('RGB', (w, h))
-    pixels = image.load()
-
-    for x in range(w):
-        for y in range(h):
-            c = blend(points, x, y)
-            pixels[x, y] = c
-
-    image.save(file)
-
-
-def blend(points: List[Point], x: int, y: int) -> Tuple[int, int, int]:
-    ratios = [1] * len(points)
     for i1, p1 in enumerate(points):
+        for p2 in points[i1 + 1:]:
+            if (p1.x, p1.y) == (p2.x, p2.y):
+                raise ValueError('Duplicate points: ' + str(p1) + ', ' + str(p2))
+
+    # Blend every pixel at once, as a (h, w) grid
+    x = numpy.arange(w)[numpy.newaxis, :]
+    y = numpy.arange(h)[:, numpy.newaxis]
+    image = Image.fromarray(blend(points, x, y), 'RGB')
+    if optimize:
+        with open(file, 'wb') as f:
+            f.write(optimize_png.encode(numpy.asarray(image.convert('RGBA'))))
+    else:
+        image.save(file)
+
+
+def blend(points: List[Point], x: numpy.ndarray, y: numpy.ndarray) -> numpy.ndarray:
+    """ Blends the colors of all points, at each position given by broadcasting x and y together. Returns an array of RGB colors, with the shape of the positions plus a trailing axis of size 3 """
+    ratios = []
+    for i1, p1 in enumerate(points):
+        ratio = numpy.ones(numpy.broadcast(x, y).shape)
         for i2, p2 in enumerate(points):
             if i1 != i2:
                 _, d2 = project(p1, p2, x, y)
-                ratios[i1] *= clamp(d2, 0, 1)
+                ratio *= numpy.clip(d2, 0, 1)
+        ratios.append(ratio)
 
     total = sum(ratios)
-    for i, t in enumerate(ratios):
-        ratios[i] = t / total
-    return mix(points, ratios)
+    return mix(points, [t / total for t in ratios])
 
 
-def mix(points: List[Point], ratios: List[float]) -> Tuple[int, int, int]:
+def mix(points: List[Point], ratios: List[numpy.ndarray]) -> numpy.ndarray:
     r = g = b = 0
     for p, ra in zip(points, ratios):
         r += p.r * ra
         g += p.g * ra
         b += p.b * ra
-    return clamp(round(r), 0, 255), clamp(round(g), 0, 255), clamp(round(b), 0, 255)
+    return numpy.clip(numpy.round(numpy.stack((r, g, b), axis=-1)), 0, 255).astype(numpy.uint8)
 
 
-def project(a: Point, b: Point, x: int, y: int) -> Tuple[float, float]:
+def project(a: Point, b: Point, x: numpy.ndarray, y: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
     k2 = b.x * b.x - b.x * a.x + b.y * b.y - b.y * a.y
     k1 = a.x * a.x - b.x * a.x + a.y * a.y - b.y * a.y
     ab2 = (a.x - b.x) * (a.x - b.x) + (a.y - b.y) * (a.y - b.y)
@@ -94,9 +102,5 @@ def project(a: Point, b: Point, x: int, y: int) -> Tuple[float, float]:
     return d1, d2
 
 
-def clamp(t: Number, lower: Number, upper: Number) -> Number:
-    return lower if t < lower else (upper if t > upper else t)
-
-
 if __name__ == '__main__':
     main()
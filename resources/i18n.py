@@ -1,7 +1,16 @@
+import bisect
+import hashlib
 import json
 import os
+from collections import defaultdict
+from typing import Dict, List, Tuple, Optional, Iterable, Sequence
 
 import Levenshtein
+from rapidfuzz import process as rapidfuzz_process
+from rapidfuzz.distance import Levenshtein as RapidfuzzLevenshtein
+
+MAX_DISTANCE = 20  # Fuzzy matches must be within this distance, and within 10% of the length of the text
+MEMORY_PATH = './.cache/translation_memory/%s.json'
 
 
 class I18n:
@@ -17,6 +26,8 @@ class I18n:
 
         self.fuzzy_matches = 0
         self.fuzzy_non_matches = 0
+        self.fuzzy_index: Optional[FuzzyIndex] = None  # Built on the first miss
+        self.memory: Optional[TranslationMemory] = None
         
         # Default translation
         if not os.path.isfile(self.lang_path):
@@ -27,9 +38,13 @@ class I18n:
                 f.write('{}\n')
 
         # Read the existing translation
-        with open(self.lang_path, 'r', encoding='utf-8') as f:
+        with open(self.lang_path, 'rb') as f:
             print('Reading translation for language %s to %s' % (self.lang, self.lang_path))
-            j = json.load(f)
+            content = f.read()
+            j = json.loads(content.decode('utf-8'))
+
+        if lang != 'en_us':
+            self.memory = TranslationMemory(lang, hashlib.sha256(content).hexdigest())
 
         # Parse json
         for key, value in j.items():
@@ -38,6 +53,19 @@ class I18n:
                 exit(-1)
             self.before[key] = value
 
+    def match_all(self, texts: Iterable[str], workers: int = -1):
+        """
+        Computes the fuzzy matches of all texts which would miss, at once, rather than one at a time in translate().
+        Matches are stored in the translation memory, where translate() will find them.
+        :param workers: The number of threads to use. -1 uses all cores.
+        """
+        if self.memory is None:
+            return  # en_us does not translate
+        misses = [text for text in dict.fromkeys(texts) if text and text not in self.before and self.memory.get(text) is None]
+        if misses:
+            for text, (distance, match) in zip(misses, batch_match(misses, self.before.keys(), workers)):
+                self.memory.put(text, match, distance, is_fuzzy_match(text, distance))
+
     def translate(self, text: str) -> str:
         """ Translates the string into the current domain """
         if self.lang == 'en_us':
@@ -47,9 +75,16 @@ class I18n:
             translated = self.before[text]  # Translate if available
         else:
             # Try a fuzzy matcher (if we're not in en_us)
-            # Use the lowercase of both keys, as difference in capitalization is almost surely not a translation issue
-            distance, match = min(((Levenshtein.distance(text.lower(), key.lower()), key) for key in self.before.keys()))
-            if distance / len(text) < 0.1 and distance < 20:  # Heuristic: < 5% of text, and < 20 overall distance
+            cached = self.memory.get(text)
+            if cached is not None:
+                match, distance, accepted = cached
+            else:
+                if self.fuzzy_index is None:
+                    self.fuzzy_index = FuzzyIndex(self.before.keys())
+                distance, match = self.fuzzy_index.match(text)
+                accepted = is_fuzzy_match(text, distance)
+                self.memory.put(text, match, distance, accepted)
+            if accepted:
                 if self.before[match] == match:
                     # This has just matched a default key that was inserted in the translated files
                     # So if we slightly modify the en_us default, we should change this value as well.
@@ -71,6 +106,8 @@ class I18n:
         """ Updates the local translation file, if needed """
         if self.lang != 'en_us' and self.fuzzy_matches + self.fuzzy_non_matches > 0:
             print('Matched %d / %d entries (%.1f%%). Updated %d entries for lang %s.' % (self.fuzzy_matches, self.fuzzy_matches + self.fuzzy_non_matches, 100 * self.fuzzy_matches / (self.fuzzy_matches + self.fuzzy_non_matches), self.fuzzy_non_matches, self.lang))
+        if self.memory is not None:
+            self.memory.save()
         if self.validate:
             assert self.before == self.after, 'Validation error translating book to lang \'%s\'' % self.lang
         with open(self.lang_path, 'w', encoding='utf-8') as f:
@@ -78,3 +115,108 @@ class I18n:
             print('Writing updated translation for language %s: %d / %d (%.2f%%)' % (self.lang, unique_count, len(self.after), 100 * unique_count / len(self.after)))
             json.dump(self.after, f, indent=2, ensure_ascii=False)
 
+
+def is_fuzzy_match(text: str, distance: int) -> bool:
+    """ Heuristic: < 10% of text, and < 20 overall distance """
+    return distance / len(text) < 0.1 and distance < MAX_DISTANCE
+
+
+def max_fuzzy_distance(text: str) -> int:
+    """ The largest distance which is a fuzzy match for text, or -1 if there is none """
+    max_distance = min(MAX_DISTANCE - 1, len(text) // 10 + 1)
+    while max_distance >= 0 and not is_fuzzy_match(text, max_distance):
+        max_distance -= 1
+    return max_distance
+
+
+def batch_match(texts: Sequence[str], keys: Iterable[str], workers: int = -1, chunk_size: int = 128) -> List[Tuple[int, Optional[str]]]:
+    """
+    Finds the closest key to each text, identically to FuzzyIndex.match(), by computing distance matrices between texts and keys in parallel.
+    Texts are matched in chunks of similar length, against only the keys within MAX_DISTANCE of the length of any text in the chunk. Keys are sorted, so the first of any tied closest keys is the smallest.
+    """
+    keys = sorted(((len(key.lower()), key) for key in keys))
+    key_lengths = [length for length, _ in keys]
+    matches: List[Tuple[int, Optional[str]]] = [(MAX_DISTANCE, None)] * len(texts)
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i].lower()))
+    for start in range(0, len(order), chunk_size):
+        chunk = order[start:start + chunk_size]
+        chunk_texts = [texts[i].lower() for i in chunk]
+        chunk_keys = sorted(key for _, key in keys[bisect.bisect_left(key_lengths, len(chunk_texts[0]) - MAX_DISTANCE):bisect.bisect_right(key_lengths, len(chunk_texts[-1]) + MAX_DISTANCE)])
+        if not chunk_keys:
+            continue
+        distances = rapidfuzz_process.cdist(chunk_texts, [key.lower() for key in chunk_keys], scorer=RapidfuzzLevenshtein.distance, score_cutoff=MAX_DISTANCE - 1, workers=workers)
+        for i, row in zip(chunk, distances):
+            best = int(row.argmin())
+            distance = int(row[best])
+            if distance <= max_fuzzy_distance(texts[i]):
+                matches[i] = distance, chunk_keys[best]
+    return matches
+
+
+class TranslationMemory:
+    """
+    An on disk cache of the fuzzy matches for a single language, so repeated runs do not need to compute any distances.
+    Entries map a digest of the source text to the chosen match, distance, and if the match was accepted. They are only valid for the lang file they were matched against, so all entries are discarded when the lang file changes.
+    """
+
+    def __init__(self, lang: str, lang_digest: str):
+        self.path = MEMORY_PATH % lang
+        self.lang_digest = lang_digest
+        self.entries: Dict[str, list] = {}
+        self.modified = False
+        if os.path.isfile(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                memory = json.load(f)
+            if memory['lang'] == lang_digest:
+                self.entries = memory['entries']
+
+    def get(self, text: str) -> Optional[Tuple[Optional[str], int, bool]]:
+        entry = self.entries.get(text_digest(text))
+        return tuple(entry) if entry is not None else None
+
+    def put(self, text: str, match: Optional[str], distance: int, accepted: bool):
+        self.entries[text_digest(text)] = [match, distance, accepted]
+        self.modified = True
+
+    def save(self):
+        if self.modified:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'lang': self.lang_digest, 'entries': self.entries}, ensure_ascii=False))
+            self.modified = False
+
+
+def text_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class FuzzyIndex:
+    """
+    Finds the closest key to a text, by Levenshtein distance of the lowercase of both, as difference in capitalization is almost surely not a translation issue. Ties are broken by the smallest key.
+    Only matches which could pass is_fuzzy_match() are found. As this bounds the distance, keys can be rejected cheaply:
+    - The distance is at least the difference in length, so only keys of a similar length are considered.
+    - Distances are computed with a cutoff of the best distance found so far, which exits early for keys that cannot be a better match.
+    """
+
+    def __init__(self, keys):
+        self.buckets: Dict[int, List[Tuple[str, str]]] = defaultdict(list)  # Length of the lowercase key -> (key, lowercase key)
+        for key in sorted(keys):
+            lower = key.lower()
+            self.buckets[len(lower)].append((key, lower))
+
+    def match(self, text: str) -> Tuple[int, Optional[str]]:
+        """ Returns the distance and closest key, or a distance which is not a fuzzy match and None if there is no possible match """
+        max_distance = max_fuzzy_distance(text)
+        if max_distance < 0:
+            return MAX_DISTANCE, None
+
+        lower = text.lower()
+        best_distance, best_key = max_distance + 1, None
+        for length in range(len(lower) - max_distance, len(lower) + max_distance + 1):
+            for key, key_lower in self.buckets.get(length, ()):
+                distance = Levenshtein.distance(lower, key_lower, score_cutoff=best_distance)
+                if distance < best_distance or (distance == best_distance and best_key is not None and key < best_key):
+                    best_distance, best_key = distance, key
+        if best_key is None:
+            return MAX_DISTANCE, None
+        return best_distance, best_key
@@ -0,0 +1,78 @@
+"""
+Lossless optimization of generated PNG images.
+
+Each image is re-encoded in the smallest of several lossless encodings: with alpha dropped if it is fully opaque, with a palette if it has at most 256 colors, and always at maximum compression with all metadata stripped.
+Encoding is deterministic, so an unchanged image always produces an identical file. An image is only rewritten if the result is smaller, and decodes to exactly the same pixels.
+"""
+
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import Sequence, Tuple, Optional
+
+import numpy
+from PIL import Image
+
+
+def optimize_all(files: Sequence[str], jobs: int = 1):
+    """ Optimizes each file, in parallel if jobs > 1, and prints a summary """
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(optimize, files, chunksize=16))
+    else:
+        results = [optimize(file) for file in files]
+    before = sum(size for size, _ in results)
+    after = sum(size for _, size in results)
+    optimized = sum(size != new_size for size, new_size in results)
+    print('Optimized = %d, Unchanged = %d, Bytes saved = %d (%.1f%%)' % (optimized, len(results) - optimized, before - after, 100 * (before - after) / max(1, before)))
+
+
+def optimize(file: str) -> Tuple[int, int]:
+    """ Optimizes a single file, returning the size before and after """
+    with open(file, 'rb') as f:
+        original = f.read()
+    with Image.open(io.BytesIO(original)) as img:
+        pixels = numpy.asarray(img.convert('RGBA'))
+    data = encode(pixels)
+    if len(data) >= len(original):
+        return len(original), len(original)
+    with open(file, 'wb') as f:
+        f.write(data)
+    return len(original), len(data)
+
+
+def encode(pixels: numpy.ndarray) -> bytes:
+    """ Encodes an (h, w, 4) array of RGBA pixels as the smallest lossless PNG """
+    candidates = [encode_truecolor(pixels), encode_palette(pixels)]
+    candidates = [data for data in candidates if data is not None and is_lossless(data, pixels)]
+    return min(candidates, key=len)  # The first is chosen on a tie, so encoding is deterministic
+
+
+def encode_truecolor(pixels: numpy.ndarray) -> bytes:
+    if (pixels[:, :, 3] == 255).all():
+        return save(Image.fromarray(numpy.ascontiguousarray(pixels[:, :, :3]), 'RGB'))
+    return save(Image.fromarray(pixels, 'RGBA'))
+
+
+def encode_palette(pixels: numpy.ndarray) -> Optional[bytes]:
+    """ Encodes with a palette, sorted by color, and with transparency for any colors which are not opaque. Returns None if there are too many colors """
+    colors, indices = numpy.unique(pixels.reshape(-1, 4), axis=0, return_inverse=True)
+    if len(colors) > 256:
+        return None
+    img = Image.fromarray(indices.reshape(pixels.shape[:2]).astype(numpy.uint8), 'P')
+    img.putpalette(colors[:, :3].tobytes())
+    bits = next(bits for bits in (1, 2, 4, 8) if len(colors) <= 1 << bits)
+    if (colors[:, 3] == 255).all():
+        return save(img, bits=bits)
+    return save(img, bits=bits, transparency=colors[:, 3].tobytes())
+
+
+def save(img: Image.Image, **kwargs) -> bytes:
+    """ Saves with maximum compression. Images are created from pixels, so they have no metadata to write """
+    buffer = io.BytesIO()
+    img.save(buffer, format='png', optimize=True, compress_level=9, **kwargs)
+    return buffer.getvalue()
+
+
+def is_lossless(data: bytes, pixels: numpy.ndarray) -> bool:
+    with Image.open(io.BytesIO(data)) as img:
+        return numpy.array_equal(numpy.asarray(img.convert('RGBA')), pixels)
@@ -52,17 +52,20 @@ class Page(NamedTuple):
             self.link_ids.append(link_id)
         return self
 
-    def translate(self, i18n: I18n):
+    def translate(self, i18n: I18n) -> JsonObject:
+        """ Returns a copy of the page data, with all text translated. The page itself is not modified, so it can be translated to many languages """
+        data = dict(self.data)
         for key in self.translation_keys:
-            if key in self.data and self.data[key] is not None:
-                value = self.data[key]
+            if key in data and data[key] is not None:
+                value = data[key]
                 if isinstance(value, SubstitutionStr):
                     try:
-                        self.data[key] = i18n.translate(value.value).format(*value.params)
+                        data[key] = i18n.translate(value.value).format(*value.params)
                     except IndexError as e:
                         raise ValueError('Error performing replacement for lang %s\n  \'%s\' -> \'%s\'' % (i18n.lang, value.value, i18n.translate(value.value))) from e
                 else:
-                    self.data[key] = i18n.translate(value)
+                    data[key] = i18n.translate(value)
+        return data
 
     def iter_all_text(self):
         for key in self.translation_keys:
@@ -88,25 +91,27 @@ class Category(NamedTuple):
     entries: Tuple[Entry, ...]
 
 
+class ValidEntry(NamedTuple):
+    entry: Entry
+    pages: Tuple[Page, ...]  # Excludes marker pages, i.e. page_break()
+    extra_recipe_mappings: Mapping[str, int] | None
+
+
 class Book:
+    """
+    The language neutral structure of a book. This is validated once, and then can be built for each language with build(), which does not modify the book or any of its pages.
+    """
 
-    def __init__(self, rm: ResourceManager, root_name: str, macros: JsonObject, i18n: I18n, local_instance: bool, reverse_translate: bool):
-        self.rm: ResourceManager = rm
+    def __init__(self, root_name: str, macros: JsonObject):
         self.root_name = root_name
-        self.category_count = 0
-        self.i18n = i18n
-        self.local_instance = local_instance
-        self.reverse_translate = reverse_translate
+        self.macros = macros
 
+        self.templates: List[Tuple[str, Tuple[Component, ...]]] = []
         self.categories: List[Category] = []
-        self.macros = macros
+        self.valid_entries: Mapping[str, List[ValidEntry]] | None = None  # Entries of each category, set by validate()
 
     def template(self, template_id: str, *components: Component):
-        self.rm.data(('patchouli_books', self.root_name, 'en_us', 'templates', template_id), {
-            'components': [{
-                'type': c.type, 'x': c.x, 'y': c.y, **c.data
-            } for c in components]
-        })
+        self.templates.append((template_id, components))
 
     def category(self, category_id: str, name: str, description: str, icon: str, parent: str | None = None, is_sorted: bool = False, entries: Tuple[Entry, ...] = ()):
         """
@@ -122,10 +127,92 @@ class Book:
         """
         self.categories.append(Category(category_id, name, description, icon, parent, is_sorted, entries))
 
-    def build(self):
+    def validate(self):
+        """ Validates the structure of all entries, and all internal links. This must be called once, before building """
+        # Find all valid link targets
+        link_targets = {}
+        for c in self.categories:
+            for e in c.entries:
+                link_targets['%s/%s' % (c.category_id, e.entry_id)] = {p.anchor_id for p in e.pages if p.anchor_id is not None}
+
+        self.valid_entries = {}
+        for c in self.categories:
+            assert not isinstance(c.entries, Entry), 'One entry in singleton entries, did you forget a comma after entry(), ?\n  at: %s' % str(c.entries)
+            self.valid_entries[c.category_id] = [self.validate_entry(link_targets, e) for e in c.entries]
+
+    def validate_entry(self, link_targets: Mapping[str, Set[str]], e: Entry) -> ValidEntry:
+        assert not isinstance(e.pages, Page), 'One entry in singleton pages, did you forget a comma after page(), ?\n  at: %s' % str(e.pages)
+        assert len(e.pages) > 0, 'Entry must have at least one page!\n  at: %s' % str(e.name)
+
+        # First page must be either text or a marker that it's not
+        if e.pages[0].type == NON_TEXT_FIRST_PAGE:
+            pages = e.pages[1:]
+        else:
+            assert e.pages[0].type == 'patchouli:text', 'An entry starts with a non text() page: Patchouli uses a standard title page with text() pages when used first for each entry which should be kept.\nIf this is intentional, add a non_text_first_page() as the first page in this entry!\n  at: entry \'%s\'' % str(e.name)
+            pages = e.pages
+
+        allow_empty_last_page = False
+        real_pages = []
+        for j, p in enumerate(pages):
+            if p.type == PAGE_BREAK:
+                assert len(real_pages) % 2 == 0, 'A page_break() required that the next entry must start on a new page, a page has been added that breaks this!\n  at: entry \'%s\', page break at index %d' % (str(e.name), j)
+            elif p.type == EMPTY_LAST_PAGE:
+                allow_empty_last_page = True
+                assert j == len(pages) - 1, 'An empty_last_page() was used but it was not the last page?\n  at: %s' % str(e.name)
+            else:
+                real_pages.append(p)
+
+        assert allow_empty_last_page or len(real_pages) % 2 == 0, 'An entry has an odd number of pages: this leaves a implicit empty() page at the end.\nIf this is intentional, add an empty_last_page() as the last page in this entry!\n  at: entry \'%s\'' % str(e.name)
+
+        extra_recipe_mappings = {}
+        for index, p in enumerate(real_pages):
+            for link in p.link_ids:
+                extra_recipe_mappings[link] = index
+        if not extra_recipe_mappings:  # Exclude if there's nothing here
+            extra_recipe_mappings = None
+
+        # Validate no duplicate anchors or links
+        seen_anchors = set()
+        seen_links = set()
+        for p in real_pages:
+            if p.anchor_id:
+                assert p.anchor_id not in seen_anchors, 'Duplicate anchor "%s" on page %s' % (p.anchor_id, p)
+                seen_anchors.add(p.anchor_id)
+            for link in p.link_ids:
+                assert link not in seen_links, 'Duplicate link "%s" on page %s' % (link, p)
+                seen_links.add(link)
+
+        # Validate all internal links of the form $(l:...)
+        for p in real_pages:
+            for page_text in p.iter_all_text():
+                for match in re.finditer(r'\$\(l:([^)]*)\)', page_text):
+                    key = match.group(1)
+                    if key.startswith('http'):
+                        continue  # Don't validate external links
+                    if '#' in key:
+                        target, anchor = key.split('#')
+                    else:
+                        target, anchor = key, None
+                    assert target in link_targets, 'Link target \'%s\' not found for link \'%s\'\n  at page: %s\n  at entry: \'%s\'' % (target, key, p, e.entry_id)
+                    if anchor is not None:
+                        assert anchor in link_targets[target], 'Link anchor \'%s\' not found for link \'%s\'\n  at page: %s\n  at entry: \'%s\'' % (anchor, key, p, e.entry_id)
+
+        return ValidEntry(e, tuple(real_pages), extra_recipe_mappings)
+
+    def build(self, rm: ResourceManager, i18n: I18n, local_instance: bool = False, reverse_translate: bool = False):
+        """ Writes the book for a single language, or if reverse translating, reads the translated book into i18n """
+        assert self.valid_entries is not None, 'Book must be validated before building'
+
+        for template_id, components in self.templates:
+            rm.data(('patchouli_books', self.root_name, 'en_us', 'templates', template_id), {
+                'components': [{
+                    'type': c.type, 'x': c.x, 'y': c.y, **c.data
+                } for c in components]
+            })
+
         # Only generate the book.json if we're in the root language
-        if self.i18n.lang == 'en_us':
-            self.rm.data(('patchouli_books', self.root_name, 'book'), {
+        if i18n.lang == 'en_us':
+            rm.data(('patchouli_books', self.root_name, 'book'), {
                 'name': 'tfc.field_guide.book_name',
                 'landing_text': 'tfc.field_guide.book_landing_text',
                 'subtitle': '${version}',
@@ -136,136 +223,85 @@ class Book:
                 'macros': self.macros
             })
 
-        # Find all valid link targets
-        link_targets = {}
-        for c in self.categories:
-            for e in c.entries:
-                link_targets['%s/%s' % (c.category_id, e.entry_id)] = {p.anchor_id for p in e.pages if p.anchor_id is not None}
+        if not reverse_translate:
+            i18n.match_all(self.iter_all_text())
 
-        for c in self.categories:
-            self.build_category(link_targets, c.category_id, c.name, c.description, c.icon, c.parent, c.is_sorted, c.entries)
+        for sortnum, c in enumerate(self.categories):
+            self.build_category(rm, i18n, local_instance, reverse_translate, sortnum, c)
 
-    def build_category(self, link_targets: Mapping[str, Set[str]], category_id: str, name: str, description: str, icon: str, parent: str | None, is_sorted: bool, entries: Tuple[Entry, ...]):
-        if self.reverse_translate:
-            data = self.load_data(('patchouli_books', self.root_name, self.i18n.lang, 'categories', category_id))
-            self.i18n.after[name] = data['name']
-            self.i18n.after[description] = data['description']
+    def iter_all_text(self):
+        """ All text which is translated when building the book """
+        for c in self.categories:
+            yield c.name
+            yield c.description
+            for e, real_pages, _ in self.valid_entries[c.category_id]:
+                yield e.name
+                for p in real_pages:
+                    yield from p.iter_all_text()
+
+    def build_category(self, rm: ResourceManager, i18n: I18n, local_instance: bool, reverse_translate: bool, sortnum: int, c: Category):
+        if reverse_translate:
+            data = self.load_data(rm, ('patchouli_books', self.root_name, i18n.lang, 'categories', c.category_id))
+            i18n.after[c.name] = data['name']
+            i18n.after[c.description] = data['description']
         else:
-            self.rm.data(('patchouli_books', self.root_name, self.i18n.lang, 'categories', category_id), {
-                'name': self.i18n.translate(name),
-                'description': self.i18n.translate(description),
-                'icon': icon,
-                'parent': parent,
-                'sortnum': self.category_count
+            rm.data(('patchouli_books', self.root_name, i18n.lang, 'categories', c.category_id), {
+                'name': i18n.translate(c.name),
+                'description': i18n.translate(c.description),
+                'icon': c.icon,
+                'parent': c.parent,
+                'sortnum': sortnum
             })
-        self.category_count += 1
-
-        category_res: ResourceLocation = utils.resource_location(self.rm.domain, category_id)
 
-        assert not isinstance(entries, Entry), 'One entry in singleton entries, did you forget a comma after entry(), ?\n  at: %s' % str(entries)
-        for i, e in enumerate(entries):
-            assert not isinstance(e.pages, Page), 'One entry in singleton pages, did you forget a comma after page(), ?\n  at: %s' % str(e.pages)
-            assert len(e.pages) > 0, 'Entry must have at least one page!\n  at: %s' % str(e.name)
-
-            # First page must be either text or a marker that it's not
-            if e.pages[0].type == NON_TEXT_FIRST_PAGE:
-                pages = e.pages[1:]
-            else:
-                assert e.pages[0].type == 'patchouli:text', 'An entry starts with a non text() page: Patchouli uses a standard title page with text() pages when used first for each entry which should be kept.\nIf this is intentional, add a non_text_first_page() as the first page in this entry!\n  at: entry \'%s\'' % str(e.name)
-                pages = e.pages
-
-            allow_empty_last_page = False
-            real_pages = []
-            for j, p in enumerate(pages):
-                if p.type == PAGE_BREAK:
-                    assert len(real_pages) % 2 == 0, 'A page_break() required that the next entry must start on a new page, a page has been added that breaks this!\n  at: entry \'%s\', page break at index %d' % (str(e.name), j)
-                elif p.type == EMPTY_LAST_PAGE:
-                    allow_empty_last_page = True
-                    assert j == len(pages) - 1, 'An empty_last_page() was used but it was not the last page?\n  at: %s' % str(e.name)
-                else:
-                    real_pages.append(p)
-
-            assert allow_empty_last_page or len(real_pages) % 2 == 0, 'An entry has an odd number of pages: this leaves a implicit empty() page at the end.\nIf this is intentional, add an empty_last_page() as the last page in this entry!\n  at: entry \'%s\'' % str(e.name)
-
-            extra_recipe_mappings = {}
-            for index, p in enumerate(real_pages):
-                for link in p.link_ids:
-                    extra_recipe_mappings[link] = index
-            if not extra_recipe_mappings:  # Exclude if there's nothing here
-                extra_recipe_mappings = None
-
-            # Validate no duplicate anchors or links
-            seen_anchors = set()
-            seen_links = set()
-            for p in real_pages:
-                if p.anchor_id:
-                    assert p.anchor_id not in seen_anchors, 'Duplicate anchor "%s" on page %s' % (p.anchor_id, p)
-                    seen_anchors.add(p.anchor_id)
-                for link in p.link_ids:
-                    assert link not in seen_links, 'Duplicate link "%s" on page %s' % (link, p)
-                    seen_links.add(link)
-
-            # Validate all internal links of the form $(l:...)
-            for p in real_pages:
-                for page_text in p.iter_all_text():
-                    for match in re.finditer(r'\$\(l:([^)]*)\)', page_text):
-                        key = match.group(1)
-                        if key.startswith('http'):
-                            continue  # Don't validate external links
-                        if '#' in key:
-                            target, anchor = key.split('#')
-                        else:
-                            target, anchor = key, None
-                        assert target in link_targets, 'Link target \'%s\' not found for link \'%s\'\n  at page: %s\n  at entry: \'%s\'' % (target, key, p, e.entry_id)
-                        if anchor is not None:
-                            assert anchor in link_targets[target], 'Link anchor \'%s\' not found for link \'%s\'\n  at page: %s\n  at entry: \'%s\'' % (anchor, key, p, e.entry_id)
+        category_res: ResourceLocation = utils.resource_location(rm.domain, c.category_id)
 
+        for i, (e, real_pages, extra_recipe_mappings) in enumerate(self.valid_entries[c.category_id]):
             # Separately translate each page
-            if self.reverse_translate:
-                rev_entry = self.load_data(('patchouli_books', self.root_name, self.i18n.lang, 'entries', category_res.path, e.entry_id))
+            if reverse_translate:
+                rev_entry = self.load_data(rm, ('patchouli_books', self.root_name, i18n.lang, 'entries', category_res.path, e.entry_id))
                 if rev_entry:
                     rev_pages = rev_entry['pages']
                     for p, rp in zip(real_pages, rev_pages):
                         for key in p.translation_keys:
                             if key in p.data and p.data[key] is not None and key in rp:
-                                self.i18n.after[str(p.data[key])] = rp[key]
+                                i18n.after[str(p.data[key])] = rp[key]
 
-                    self.i18n.after[e.name] = rev_entry['name']
+                    i18n.after[e.name] = rev_entry['name']
                 else:
                     print('Warning: missing book entry: %s/%s' % (category_res.path, e.entry_id))
                 continue
 
-            entry_name = self.i18n.translate(e.name)
-            for p in real_pages:
-                p.translate(self.i18n)
+            entry_name = i18n.translate(e.name)
+            pages_data = [p.translate(i18n) for p in real_pages]
 
-            self.rm.data(('patchouli_books', self.root_name, self.i18n.lang, 'entries', category_res.path, e.entry_id), {
+            rm.data(('patchouli_books', self.root_name, i18n.lang, 'entries', category_res.path, e.entry_id), {
                 'name': entry_name,
-                'category': self.prefix(category_res.path),
+                'category': prefix(category_res.path, local_instance),
                 'icon': e.icon,
                 'pages': [{
-                    'type': self.prefix(p.type) if p.custom else p.type,
+                    'type': prefix(p.type, local_instance) if p.custom else p.type,
                     'anchor': p.anchor_id,
-                    **p.data
-                } for p in real_pages],
+                    **data
+                } for p, data in zip(real_pages, pages_data)],
                 'advancement': e.advancement,
                 'read_by_default': True,
-                'sortnum': i if is_sorted else None,
+                'sortnum': i if c.is_sorted else None,
                 'extra_recipe_mappings': extra_recipe_mappings
             })
 
-    def prefix(self, path: str) -> str:
-        """ In a local instance, domains are all under patchouli, otherwise under tfc """
-        return ('patchouli' if self.local_instance else 'tfc') + ':' + path
-
-    def load_data(self, name_parts: ResourceIdentifier) -> JsonObject:
-        res = utils.resource_location(self.rm.domain, name_parts)
-        path = os.path.join(*self.rm.resource_dir, 'data', res.domain, res.path) + '.json'
+    def load_data(self, rm: ResourceManager, name_parts: ResourceIdentifier) -> JsonObject:
+        res = utils.resource_location(rm.domain, name_parts)
+        path = os.path.join(*rm.resource_dir, 'data', res.domain, res.path) + '.json'
         if os.path.isfile(path):
             with open(path, 'r', encoding='utf-8') as f:
                 return json.load(f)
 
 
+def prefix(path: str, local_instance: bool) -> str:
+    """ In a local instance, domains are all under patchouli, otherwise under tfc """
+    return ('patchouli' if local_instance else 'tfc') + ':' + path
+
+
 def entry(entry_id: str, name: str, icon: str, advancement: str | None = None, pages: Tuple[Page, ...] = ()) -> Entry:
     """
     :param entry_id: The id of this entry.
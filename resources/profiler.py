@@ -0,0 +1,140 @@
+"""
+Profiling for resource generation.
+
+Each generator is profiled as a whole, and split into sections, by calls to section() at the start of each top level loop or group of resources.
+A section lasts until the next section, or the end of the generator. When not profiling, section() does nothing.
+
+For each generator and section, this records wall time, CPU time, files emitted, bytes serialized (as written to disk), and peak memory (as traced by tracemalloc, relative to the start of the section).
+Note that tracing memory allocations slows down generation, so times are best compared against each other, not against unprofiled runs.
+
+The JSON report is keyed by action, i.e. 'assets', and each profiled action replaces only its own timings, so profiling several actions (one after another, or in one invocation) keeps a report for each.
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from typing import NamedTuple, List, Optional, Sequence, Dict, Any
+
+from mcresources import ResourceManager, utils
+
+REPORT_PATH = './.cache/datagen_profile.json'
+
+_active: Optional['Profiler'] = None
+
+
+class Timing(NamedTuple):
+    name: str  # Either the generator name, i.e. 'assets', or the section name, i.e. 'assets/rocks'
+    wall_time: float  # Seconds
+    cpu_time: float  # Seconds
+    files: int
+    bytes: int
+    peak_memory: int  # Bytes
+
+
+class Profiler:
+
+    def __init__(self):
+        self.timings: List[Timing] = []
+        self.files = 0
+        self.bytes = 0
+        self.overhead_wall = 0  # Time spent by the profiler itself, which is excluded from timings
+        self.overhead_cpu = 0
+        self.generator = None
+        self.section_start = None
+        self.max_memory = 0  # The largest traced memory seen during the current generator
+
+    def wrap(self, rm: ResourceManager):
+        """ Counts every file written by rm, and the bytes it serializes to """
+        write = rm.write
+
+        def profiled_write(path_parts: Sequence[str], data_in):
+            wall, cpu = time.perf_counter(), time.process_time()
+            text = json.dumps(utils.del_none({'__comment__': 'This file was automatically created by mcresources', **data_in}), indent=rm.indent, ensure_ascii=rm.ensure_ascii)
+            self.files += 1
+            self.bytes += len(text.encode('utf-8'))
+            self.overhead_wall += time.perf_counter() - wall
+            self.overhead_cpu += time.process_time() - cpu
+            write(path_parts, data_in)
+
+        rm.write = profiled_write
+
+    def profile(self, name: str, generator, rm: ResourceManager):
+        """ Runs a generator with profiling, recording a timing for the generator as a whole, and for each section within it """
+        global _active
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        _active = self
+        self.generator = name
+        self.section_start = None
+        self.max_memory = 0
+        tracemalloc.reset_peak()
+        start = self.snapshot(name)
+        try:
+            generator(rm)
+        finally:
+            self.end_section()
+            self.record(name, start, self.max_memory)
+            _active = None
+            self.generator = None
+            if not tracing:
+                tracemalloc.stop()
+
+    def section(self, name: str):
+        self.end_section()
+        self.section_start = self.snapshot(name)
+
+    def end_section(self):
+        """ Ends the current section, if there is one, and resets the traced peak memory for the next one """
+        peak = tracemalloc.get_traced_memory()[1]
+        self.max_memory = max(self.max_memory, peak)
+        if self.section_start is not None:
+            self.record('%s/%s' % (self.generator, self.section_start[0]), self.section_start, peak)
+            self.section_start = None
+        tracemalloc.reset_peak()
+
+    def snapshot(self, name: str) -> tuple:
+        return name, time.perf_counter(), time.process_time(), self.files, self.bytes, self.overhead_wall, self.overhead_cpu, tracemalloc.get_traced_memory()[0]
+
+    def record(self, name: str, start: tuple, peak: int):
+        _, wall, cpu, files, size, overhead_wall, overhead_cpu, memory = start
+        self.timings.append(Timing(
+            name,
+            time.perf_counter() - wall - (self.overhead_wall - overhead_wall),
+            time.process_time() - cpu - (self.overhead_cpu - overhead_cpu),
+            self.files - files,
+            self.bytes - size,
+            max(0, peak - memory)
+        ))
+
+
+def section(name: str):
+    """ Marks the start of a section within the currently profiled generator """
+    if _active is not None:
+        _active.section(name)
+
+
+def report(action: str, timings: Sequence[Timing], path: str = REPORT_PATH):
+    """ Merges the timings of an action into the JSON report, and prints a table of all timings, slowest first """
+    timings = sorted(timings, key=lambda t: t.wall_time, reverse=True)
+    actions = load_report(path)
+    actions[action] = [t._asdict() for t in timings]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(actions, indent=2))
+
+    print('%-40s %10s %10s %8s %12s %12s' % ('Name', 'Wall (s)', 'CPU (s)', 'Files', 'Bytes', 'Peak Memory'))
+    for t in timings:
+        print('%-40s %10.3f %10.3f %8d %12d %12d' % (t.name, t.wall_time, t.cpu_time, t.files, t.bytes, t.peak_memory))
+    print('Wrote profile of \'%s\' to %s' % (action, path))
+
+
+def load_report(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """ Loads the timings of each action from an existing report. Reports which are missing, or not keyed by action, are treated as empty """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            actions = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return actions if isinstance(actions, dict) else {}
@@ -9,6 +9,7 @@ from mcresources import ResourceManager, RecipeContext, utils
 from mcresources.type_definitions import ResourceIdentifier, Json
 
 from constants import *
+import profiler
 
 
 class Rules(Enum):
@@ -51,6 +52,7 @@ def generate(rm: ResourceManager):
         rm.crafting_shaped(recipe_name + '_wall', ['XXX', 'XXX'], base_block, (6, base_block + '_wall')).with_advancement(base_block)
 
     # Rock Things
+    profiler.section('rocks')
     for rock in ROCKS.keys():
 
         cobble = 'tfc:rock/cobble/%s' % rock
@@ -273,6 +275,7 @@ def generate(rm: ResourceManager):
     # ============================
     # Collapse / Landslide Recipes
     # ============================
+    profiler.section('collapse')
 
     # TRIGGERS include raw, hardened, and ores
     # STARTS include raw, ores
@@ -354,6 +357,7 @@ def generate(rm: ResourceManager):
     # ============
     # Chisel Recipes
     # ============
+    profiler.section('chisel')
 
     def chisel_stair_slab(name: str, ingredient: str):
         chisel_recipe(rm, name + '_stairs', ingredient, ingredient + '_stairs', 'stair')
@@ -389,6 +393,7 @@ def generate(rm: ResourceManager):
     # ============
     # Heat Recipes
     # ============
+    profiler.section('heat')
 
     heat_recipe(rm, 'torch_from_stick', '#forge:rods/wooden', 60, result_item='2 tfc:torch')
     heat_recipe(rm, 'torch_from_stick_bunch', 'tfc:stick_bunch', 60, result_item='18 tfc:torch')
@@ -432,6 +437,7 @@ def generate(rm: ResourceManager):
     heat_recipe(rm, 'gold_bell', 'minecraft:bell', METALS['gold'].melt_temperature, None, '100 tfc:metal/gold')
 
     # Mold, Ceramic Firing
+    profiler.section('pottery')
     for tool, tool_data in METAL_ITEMS.items():
         if tool_data.mold:
             heat_recipe(rm, ('%s_mold' % tool), 'tfc:ceramic/unfired_%s_mold' % tool, POTTERY_MELT, 'tfc:ceramic/%s_mold' % tool)
@@ -466,6 +472,7 @@ def generate(rm: ResourceManager):
             disable_recipe(rm, 'minecraft:%s_%s' % (variant, tool))
 
     # Quern
+    profiler.section('quern')
     quern_recipe(rm, 'olive', 'tfc:food/olive', 'tfc:olive_paste', count=2)
     quern_recipe(rm, 'borax', 'tfc:ore/borax', 'tfc:powder/flux', count=6)
     quern_recipe(rm, 'fluxstone', '#tfc:fluxstone', 'tfc:powder/flux', count=2)
@@ -644,6 +651,7 @@ def generate(rm: ResourceManager):
             rm.crafting_shaped('crafting/stone/%s_%s' % (tool, category), ['X', 'Y'], {'X': 'tfc:stone/%s_head/%s' % (tool, category), 'Y': '#forge:rods/wooden'}, 'tfc:stone/%s/%s' % (tool, category)).with_advancement('tfc:stone/%s_head/%s' % (tool, category))
 
     # Casting Recipes
+    profiler.section('casting')
 
     for metal, metal_data in METALS.items():
         for tool, tool_data in METAL_ITEMS.items():
@@ -671,6 +679,7 @@ def generate(rm: ResourceManager):
     blast_furnace_recipe(rm, 'pig_iron', '1 tfc:metal/cast_iron', '1 tfc:metal/pig_iron', '#tfc:flux')
 
     # Barrel Recipes
+    profiler.section('barrel')
     for size, amount, output in (('small', 300, 1), ('medium', 400, 2), ('large', 500, 3)):
         barrel_sealed_recipe(rm, '%s_soaked_hide' % size, '%s Soaked Hide' % size, 8000, 'tfc:%s_raw_hide' % size, '%d tfc:limewater' % amount, output_item='tfc:%s_soaked_hide' % size)
         barrel_sealed_recipe(rm, '%s_prepared_hide' % size, '%s Prepared Hide' % size, 8000, 'tfc:%s_scraped_hide' % size, '%d minecraft:water' % amount, output_item='tfc:%s_prepared_hide' % size)
@@ -746,6 +755,7 @@ def generate(rm: ResourceManager):
     barrel_instant_recipe(rm, 'clean_soup_bowl', '#tfc:dynamic_bowl_items', '100 minecraft:water', output_item=item_stack_provider(empty_bowl=True))
 
     # Loom Recipes
+    profiler.section('loom')
     loom_recipe(rm, 'burlap_cloth', 'tfc:jute_fiber', 12, 'tfc:burlap_cloth', 12, 'tfc:block/burlap')
     loom_recipe(rm, 'wool_cloth', 'tfc:wool_yarn', 16, 'tfc:wool_cloth', 16, 'minecraft:block/white_wool')
     loom_recipe(rm, 'silk_cloth', 'minecraft:string', 24, 'tfc:silk_cloth', 24, 'minecraft:block/white_wool')
@@ -753,6 +763,7 @@ def generate(rm: ResourceManager):
     loom_recipe(rm, 'unrefined_paper', 'tfc:soaked_papyrus_strip', 4, 'tfc:unrefined_paper', 8, 'tfc:block/unrefined_paper')
 
     # Anvil Working Recipes
+    profiler.section('anvil')
     metal = '?'
 
     def item(_variant: str) -> str:
@@ -828,6 +839,7 @@ def generate(rm: ResourceManager):
     anvil_recipe(rm, 'brass_mechanisms', '#forge:ingots/brass', '2 tfc:brass_mechanisms', 1, Rules.punch_last, Rules.hit_second_last, Rules.punch_third_last)
 
     # Welding Recipes
+    profiler.section('welding')
 
     for metal, metal_data in METALS.items():
         if 'part' in metal_data.types:
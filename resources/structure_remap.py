@@ -0,0 +1,57 @@
+"""
+Bulk palette remapping for structure templates.
+
+A structure template stores each block as a position and an index into its palette, so a template can be changed to use different blocks (i.e. another wood, or another rock) by replacing only its palette.
+A single decoded template is remapped with any number of substitution tables at once. Each variant shares the blocks and entities of the template, and has its own palette.
+
+Substitution tables map block names in the template to a substitution. For example, trees map 'minecraft:oak_log' to the log of each wood, and rock structures (such as the rock spike and aqueduct test structures) could map 'tfc:rock/aqueduct/andesite' to the aqueduct of each rock.
+"""
+
+import copy
+from typing import NamedTuple, Dict, Mapping, Optional, List
+
+from nbtlib import nbt
+from nbtlib.tag import String as StringTag, Int as IntTag, Compound, List as ListTag
+
+
+class Substitution(NamedTuple):
+    name: str  # The name of the new block
+    properties: Mapping[str, str] = {}  # Properties which are added to, or replaced in, the block state
+
+
+SubstitutionTable = Mapping[str, Substitution]  # Block names in the template, to their substitution
+
+
+def remap_all(template: nbt.File, tables: Mapping[str, SubstitutionTable], data_version: Optional[int] = None) -> Dict[str, nbt.File]:
+    """
+    Remaps a template with each of a number of substitution tables.
+    :param template: The template. It is not modified, and the blocks and entities of every variant are shared with it, so they must not be modified.
+    :param tables: Substitution tables, by key. Blocks which are not in a table are kept.
+    :param data_version: If present, the data version of each variant is replaced, i.e. to avoid needing to run DFU on anything.
+    :return: A variant of the template for each table, by key.
+    """
+    return {key: remap(template, table, data_version) for key, table in tables.items()}
+
+
+def remap(template: nbt.File, table: SubstitutionTable, data_version: Optional[int] = None) -> nbt.File:
+    f = copy.copy(template)  # Shallow, so only the palette is replaced
+    f['palette'] = ListTag[Compound]([substitute(block, table) for block in template['palette']])
+    if data_version is not None:
+        f['DataVersion'] = IntTag(data_version)
+    return f
+
+
+def substitute(block: Compound, table: SubstitutionTable) -> Compound:
+    substitution = table.get(str(block['Name']))
+    if substitution is None:
+        return block
+    block = Compound(block)
+    block['Name'] = StringTag(substitution.name)
+    if substitution.properties:
+        block['Properties'] = Compound({**block.get('Properties', {}), **{key: StringTag(value) for key, value in substitution.properties.items()}})
+    return block
+
+
+def unmapped_blocks(template: nbt.File, table: SubstitutionTable) -> List[str]:
+    """ The names of all blocks in the template which the table does not substitute """
+    return [str(block['Name']) for block in template['palette'] if str(block['Name']) not in table]
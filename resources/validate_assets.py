@@ -1,29 +1,53 @@
-from glob import glob
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Set, Sequence, Dict, Any
+
 from mcresources import utils
 
+import dedupe_textures
+
 ASSETS_PATH = './src/main/resources/assets/'
 TEXTURE_FORGIVENESS_PATHS = ('_fluff', 'block/burlap', 'block/molten_flow', 'block/paper', 'block/unrefined_paper', 'yellow_bell', 'red_bell', 'green_bell', 'metal/full', 'sandstone/side', 'quiver', 'placed_item')
 LANG_PATH = ASSETS_PATH + 'tfc/lang/en_us.json'
 SOUNDS_PATH = ASSETS_PATH + 'tfc/sounds.json'
 
-def main():
+def main(jobs: int = 1):
+    """ Validates all assets. Every JSON file is parsed once, in parallel if jobs > 1, and all validators run over the parsed documents """
     errors = 0
-    model_locations = glob(ASSETS_PATH + 'tfc/models/**/*.json', recursive=True)
-    state_locations = glob(ASSETS_PATH + 'tfc/blockstates/**/*.json', recursive=True)
-    mc_state_locations = glob(ASSETS_PATH + 'minecraft/blockstates/**/*.json', recursive=True)
-    lang_json = load(LANG_PATH)
-    sound_json = load(SOUNDS_PATH)
-    errors += validate_lang(state_locations, lang_json, sound_json)
-    errors, km = validate_model_parents(model_locations)
-    errors += validate_textures(model_locations)
-    bs_errors, km2 = validate_blockstate_models(state_locations)
-    bs_errors2, km3 = validate_blockstate_models(mc_state_locations)
+    files = index_files(ASSETS_PATH)
+    model_locations = find_files(files, ASSETS_PATH + 'tfc/models/', '.json')
+    state_locations = find_files(files, ASSETS_PATH + 'tfc/blockstates/', '.json')
+    mc_state_locations = find_files(files, ASSETS_PATH + 'minecraft/blockstates/', '.json')
+    documents = load_all([*model_locations, *state_locations, *mc_state_locations, LANG_PATH, SOUNDS_PATH], jobs)
+    errors += validate_lang(state_locations, documents[LANG_PATH], documents[SOUNDS_PATH])
+    parent_errors, km = validate_model_parents(model_locations, files, documents)
+    errors += parent_errors
+    errors += validate_textures(model_locations, files, documents)
+    bs_errors, km2 = validate_blockstate_models(state_locations + mc_state_locations, files, documents)
     errors += bs_errors
-    errors += bs_errors2
-    errors += validate_models_used(model_locations, km + km2 + km3)
+    errors += validate_models_used(model_locations, km + km2)
+    errors += validate_duplicate_textures()
     assert errors == 0
 
+def index_files(path: str) -> Set[str]:
+    """ Finds every file under a directory with a single walk, so checking if a file exists is a set lookup. Hidden files and directories are skipped, as with glob() """
+    files = set()
+    dirs = [path]
+    while dirs:
+        with os.scandir(dirs.pop()) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir():
+                    dirs.append(entry.path)
+                else:
+                    files.add(entry.path.replace('\\', '/'))
+    return files
+
+def find_files(files: Set[str], prefix: str, suffix: str):
+    return sorted(f for f in files if f.startswith(prefix) and f.endswith(suffix))
+
 def validate_lang(state_locations, lang_json, sound_json):
     tested = 0
     tested_sound = 0
@@ -50,23 +74,23 @@ def validate_lang(state_locations, lang_json, sound_json):
     print('Lang Validation: %s blocks tested, %s sounds tested, %s errors' % (tested, tested_sound, errors))
     return errors
 
-def validate_blockstate_models(state_locations):
+def validate_blockstate_models(state_locations, files: Set[str], documents: Dict[str, Any]):
     tested = 0
     errors = 0
     known_models = []
     for f in state_locations:
-        state_file = load(f)
+        state_file = documents[f]
         if 'variants' in state_file:
             variants = state_file['variants']
             for variant in variants.values():
                 if isinstance(variant, list):  # catches randomized models
                     for v in variant:
                         model = v['model']
-                        tested, errors = find_model_file(f, model, tested, errors, 'Blockstate file %s points to non-existent model: %s')
+                        tested, errors = find_model_file(f, model, tested, errors, 'Blockstate file %s points to non-existent model: %s', files)
                         known_models.append(model)
                 elif 'model' in variant:
                     model = variant['model']
-                    tested, errors = find_model_file(f, model, tested, errors, 'Blockstate file %s points to non-existent model: %s')
+                    tested, errors = find_model_file(f, model, tested, errors, 'Blockstate file %s points to non-existent model: %s', files)
                     known_models.append(model)
         elif 'multipart' in state_file:
             multipart = state_file['multipart']
@@ -77,11 +101,11 @@ def validate_blockstate_models(state_locations):
                         for entry in apply:
                             if 'model' in entry:
                                 model = entry['model']
-                                tested, errors = find_model_file(f, model, tested, errors, 'Blockstate file %s points to non-existent model: %s')
+                                tested, errors = find_model_file(f, model, tested, errors, 'Blockstate file %s points to non-existent model: %s', files)
                                 known_models.append(model)
                     elif 'model' in apply:
                         model = apply['model']
-                        tested, errors = find_model_file(f, model, tested, errors, 'Blockstate file %s points to non-existent model: %s')
+                        tested, errors = find_model_file(f, model, tested, errors, 'Blockstate file %s points to non-existent model: %s', files)
                         known_models.append(model)
     print('Blockstate Validation: Validated %s files, found %s errors' % (tested, errors))
     return errors, known_models
@@ -90,11 +114,11 @@ def validate_blockstate_models(state_locations):
 def validate_models_used(model_locations, known_models):
     tested = 0
     errors = 0
-    fixed_km = []
+    fixed_km = set()
     fixed_ml = [f.replace('\\', '/') for f in model_locations if 'item' not in f]
     for f in known_models:
         res = utils.resource_location(f)
-        fixed_km.append(ASSETS_PATH + 'tfc/models/%s.json' % res.path)
+        fixed_km.add(ASSETS_PATH + 'tfc/models/%s.json' % res.path)
     for f in fixed_ml:
         tested += 1
         if f not in fixed_km:
@@ -103,26 +127,36 @@ def validate_models_used(model_locations, known_models):
     print('Unused model validation: Validated %s files, found %s errors' % (tested, errors))
     return errors
 
-def validate_model_parents(model_locations):
+def validate_model_parents(model_locations, files: Set[str], documents: Dict[str, Any]):
     tested = 0
     errors = 0
     known_models = []
     for f in model_locations:
-        model_file = load(f)
+        model_file = documents[f]
         if 'parent' in model_file:
             parent = model_file['parent']
-            tested, errors = find_model_file(f, parent, tested, errors, 'Model parent not found. Model: %s, Parent: %s')
+            tested, errors = find_model_file(f, parent, tested, errors, 'Model parent not found. Model: %s, Parent: %s', files)
             known_models.append(parent)
     print('Parent Validation: Validated %s files, found %s errors' % (tested, errors))
     return errors, known_models
 
-def validate_textures(model_locations):
+def validate_duplicate_textures():
+    errors = 0
+    duplicates = dedupe_textures.load_duplicates()
+    for texture, canonical in dedupe_textures.verify(duplicates):
+        print('Duplicate texture is missing or not identical to its canonical texture: %s, Canonical: %s' % (texture, canonical))
+        errors += 1
+    print('Duplicate Texture Validation: Validated %s textures, found %s errors' % (len(duplicates), errors))
+    return errors
+
+def validate_textures(model_locations, files: Set[str], documents: Dict[str, Any]):
     tested = 0
     files_tested = 0
     errors = 0
-    existing_textures = []
+    existing_textures = set()
+    duplicates = {ASSETS_PATH + 'tfc/textures/%s.png' % utils.resource_location(texture).path for texture in dedupe_textures.load_duplicates()}  # Generated models reference the canonical texture instead
     for f in model_locations:
-        model_file = load(f)
+        model_file = documents[f]
         if 'textures' in model_file:
             textures = model_file['textures']
             if isinstance(textures, dict):
@@ -133,14 +167,13 @@ def validate_textures(model_locations):
                         if res.domain == 'tfc':
                             tested += 1
                             path = ASSETS_PATH + 'tfc/textures/%s.png' % res.path
-                            if len(glob(path)) == 0:
+                            if path not in files:
                                 print('Texture file not found. Name: %s Filepath: %s' % (f, path))
                                 errors += 1
                             else:
-                                existing_textures.append(path)
-    for f in glob(ASSETS_PATH + 'tfc/textures/**/*.png', recursive=True):
-        f = f.replace('\\', '/')
-        if f not in existing_textures and ('block/' in f or 'item/' in f):
+                                existing_textures.add(path)
+    for f in find_files(files, ASSETS_PATH + 'tfc/textures/', '.png'):
+        if f not in existing_textures and f not in duplicates and ('block/' in f or 'item/' in f):
             forgiven = False
             for check in TEXTURE_FORGIVENESS_PATHS:
                 if check in f:
@@ -152,18 +185,25 @@ def validate_textures(model_locations):
     print('Texture Validation: Verified %s files, %s texture entries, found %s errors' % (files_tested, tested, errors))
     return errors
 
-def find_model_file(file_path: str, initial_path: str, tested: int, errors: int, on_error: str):
+def find_model_file(file_path: str, initial_path: str, tested: int, errors: int, on_error: str, files: Set[str]):
     res = utils.resource_location(initial_path)
     if res.domain == 'tfc':
         tested += 1
         path = ASSETS_PATH + 'tfc/models/%s.json' % res.path
-        found = len(glob(path))
-        if found != 1:
+        if path not in files:
             print(on_error % (file_path, path))
             errors += 1
     return tested, errors
 
 
+def load_all(files: Sequence[str], jobs: int = 1) -> Dict[str, Any]:
+    """ Parses each JSON file, in parallel if jobs > 1, and returns the documents by file path """
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            return dict(zip(files, pool.map(load, files, chunksize=256)))
+    return {f: load(f) for f in files}
+
+
 def load(fn: str):
     with open(fn, 'r', encoding='utf-8') as f:
         return json.load(f)
@@ -6,6 +6,7 @@ from mcresources import ResourceManager, utils
 from mcresources.type_definitions import ResourceIdentifier, JsonObject, Json, VerticalAnchor
 
 from constants import *
+import profiler
 
 
 def generate(rm: ResourceManager):
@@ -13,6 +14,7 @@ def generate(rm: ResourceManager):
     # Biomes -> in_biome/<step>/<optional biome>
     # in_biome/ -> other tags in the form feature/<name>s
     # feature/ -> individual features
+    profiler.section('tags')
 
     # Tags: in_biome/
     placed_feature_118_hack(rm, 'in_biome/erosion', 'tfc:erosion')
@@ -53,6 +55,7 @@ def generate(rm: ResourceManager):
     placed_feature_tag(rm, 'feature/volcanoes', 'tfc:volcano_rivulet', 'tfc:volcano_caldera', 'tfc:random_volcano_fissure')
 
     # Biomes
+    profiler.section('biomes')
     biome(rm, 'badlands', 'mesa', 'mesa', lake_features=False)
     biome(rm, 'inverted_badlands', 'mesa', 'mesa', lake_features=False)
     biome(rm, 'canyons', 'plains', 'plains', boulders=True, lake_features=False, volcano_features=True, hot_spring_features=True)
@@ -88,6 +91,7 @@ def generate(rm: ResourceManager):
     biome(rm, 'plateau_lake', 'extreme_hills', 'water', boulders=True, spawnable=False)
 
     # Carvers
+    profiler.section('carvers')
     rm.configured_carver('cave', 'tfc:cave', {
         'probability': 0.3,
         'y': height_provider(-56, 126),
@@ -117,6 +121,7 @@ def generate(rm: ResourceManager):
     })
 
     # Configured and Placed Features
+    profiler.section('features')
 
     configured_placed_feature(rm, 'surface_grasses', 'tfc:noisy_multiple', {'features': '#tfc:feature/surface_grasses', 'biome_check': False})
 
@@ -340,6 +345,7 @@ def generate(rm: ResourceManager):
     rm.placed_feature('random_active_hot_spring', 'tfc:random_active_hot_spring', decorate_chance(50), decorate_square())
 
     # Trees / Forests
+    profiler.section('trees')
     forest_config(rm, 30, 210, 17, 40, 'acacia', True)
     forest_config(rm, 60, 240, 1, 15, 'ash', True)
     forest_config(rm, 350, 500, -18, 5, 'aspen', False)
@@ -445,6 +451,7 @@ def generate(rm: ResourceManager):
     configured_placed_feature(rm, ('tree', 'willow_dead'), 'tfc:random_tree', random_config('willow', 3, 1, '_dead', place=tree_placement_config(2, 3, True, True)))
 
     # Ore Veins
+    profiler.section('ore_veins')
     for vein_name, vein in ORE_VEINS.items():
         rocks = expand_rocks(vein.rocks, vein_name)
         ore = ORES[vein.ore]  # standard ore
@@ -560,6 +567,7 @@ def generate(rm: ResourceManager):
     rm.placed_feature('hanging_roots_patch', 'tfc:hanging_roots_patch', decorate_count(10), decorate_square(), decorate_range(40, 72), decorate_scanner('up', 12), decorate_random_offset(0, -1), decorate_climate(min_rain=300, min_temp=0), decorate_biome())
 
     # Plants
+    profiler.section('plants')
     configured_plant_patch_feature(rm, ('plant', 'allium'), plant_config('tfc:plant/allium[age=1,stage=1]', 1, 10, 10), decorate_chance(5), decorate_square(), decorate_climate(-10, -2, 150, 400, min_forest='edge', max_forest='normal'))
     configured_plant_patch_feature(rm, ('plant', 'badderlocks'), plant_config('tfc:plant/badderlocks[age=1,stage=1,fluid=empty,part=lower]', 1, 7, 100, emergent_plant=True), decorate_chance(2), decorate_square(), decorate_climate(-18, 2, 150, 500))
     configured_plant_patch_feature(rm, ('plant', 'barrel_cactus'), plant_config('tfc:plant/barrel_cactus[age=1,stage=1,part=lower]', 1, 15, 10, tall_plant=True), decorate_chance(5), decorate_square(), decorate_climate(4, 18, 0, 85))
@@ -758,6 +766,7 @@ def generate(rm: ResourceManager):
     }), decorate_square(), decorate_climate(min_temp=12, max_temp=50, fuzzy=True), decorate_heightmap('ocean_floor_wg'))
 
     # Groundcover
+    profiler.section('groundcover')
     configured_patch_feature(rm, 'driftwood', patch_config('tfc:groundcover/driftwood[fluid=empty]', 1, 15, 5, True), decorate_chance(6), decorate_square(), decorate_climate(-10, 50, 200, 500))
     configured_patch_feature(rm, 'clam', patch_config('tfc:groundcover/clam[fluid=empty]', 1, 15, 5, 'salt'), decorate_chance(6), decorate_square(), decorate_climate(-50, 22, 10, 450))
     configured_patch_feature(rm, 'mollusk', patch_config('tfc:groundcover/mollusk[fluid=empty]', 1, 15, 5, 'salt'), decorate_chance(6), decorate_square(), decorate_climate(-10, 30, 150, 500))